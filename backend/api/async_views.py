@@ -0,0 +1,91 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.urls import URLPattern
+from django.utils.cache import get_conditional_response
+from rest_framework.renderers import JSONRenderer
+
+from api.caching import (RESPONSE_KEY, get_cached_model_version, get_etag,
+                         get_model_version, set_validators)
+from recipes.models import Ingredient, Tag
+
+ASYNC_READ_VIEWS = {
+    'tags-list': Tag,
+    'tags-detail': Tag,
+    'ingredients-list': Ingredient,
+    'ingredients-detail': Ingredient,
+}
+
+
+async def read_cache(function, *args):
+    """Чтение из кеша для асинхронного представления.
+
+    В Django 3.2 у кеша нет асинхронного API, поэтому сетевые бэкенды
+    читаются в пуле потоков. Кеш в памяти процесса не блокирует цикл
+    событий и читается напрямую, без переключения потоков.
+    """
+    if isinstance(caches['default'], LocMemCache):
+        return function(*args)
+    return await sync_to_async(function, thread_sensitive=False)(*args)
+
+
+def accepts_json(request, kwargs):
+    return (
+        kwargs.get('format') in (None, 'json')
+        and 'format' not in request.GET
+        and 'text/html' not in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+def async_read_view(view, model):
+    """Асинхронная обёртка над представлением справочника.
+
+    Ответы 304 и ответы из кеша CachedResponseMixin отдаются прямо в
+    цикле событий, без потока для синхронного кода. Остальные запросы
+    передаются исходному представлению через sync_to_async с
+    thread_sensitive=True, как это делает Django для синхронных
+    представлений, поэтому работа с ORM остаётся в одном потоке.
+    """
+    sync_view = sync_to_async(view, thread_sensitive=True)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method == 'GET' and accepts_json(request, kwargs):
+            version = await read_cache(get_cached_model_version, model)
+            if version is None:
+                version = await sync_to_async(get_model_version)(model)
+            etag = get_etag(version, request)
+            last_modified = int(version)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                return response
+            data = await read_cache(cache.get, RESPONSE_KEY.format(etag))
+            if data is not None:
+                response = HttpResponse(
+                    JSONRenderer().render(data),
+                    content_type='application/json',
+                )
+                set_validators(response, etag, last_modified)
+                response['Vary'] = 'Accept'
+                return response
+        return await sync_view(request, *args, **kwargs)
+
+    async_view.csrf_exempt = True
+    return async_view
+
+
+def wrap_async_read_views(patterns):
+    """Заменяет представления чтения справочников асинхронными."""
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_read_view(pattern.callback, ASYNC_READ_VIEWS[pattern.name]),
+            pattern.default_args,
+            pattern.name,
+        )
+        if pattern.name in ASYNC_READ_VIEWS
+        else pattern
+        for pattern in patterns
+    ]
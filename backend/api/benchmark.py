@@ -0,0 +1,166 @@
+import base64
+import io
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tag
+
+ROUTES = (
+    ('recipes-list', 'get', '/api/recipes/'),
+    ('recipes-list-tags', 'get', '/api/recipes/?tags={tag}'),
+    ('recipes-list-author', 'get', '/api/recipes/?author={author}'),
+    ('recipes-list-favorited', 'get', '/api/recipes/?is_favorited=1'),
+    ('recipes-list-cart', 'get', '/api/recipes/?is_in_shopping_cart=1'),
+    ('recipes-search', 'get', '/api/recipes/search/?q={query}'),
+    (
+        'recipes-match',
+        'get',
+        '/api/recipes/match/?ingredients={ingredient_id}&missing=1',
+    ),
+    ('recipes-detail', 'get', '/api/recipes/{recipe}/'),
+    ('recipes-similar', 'get', '/api/recipes/{recipe}/similar/'),
+    ('recipes-create', 'post', '/api/recipes/'),
+    ('recipes-update', 'patch', '/api/recipes/{created}/'),
+    ('recipes-delete', 'delete', '/api/recipes/{created}/'),
+    ('recipes-feed', 'get', '/api/recipes/feed/'),
+    ('recipes-download', 'get', '/api/recipes/download_shopping_cart/'),
+    ('recipes-favorite-add', 'post', '/api/recipes/{recipe}/favorite/'),
+    ('recipes-favorite-remove', 'delete', '/api/recipes/{recipe}/favorite/'),
+    ('recipes-cart-add', 'post', '/api/recipes/{recipe}/shopping_cart/'),
+    (
+        'recipes-cart-remove',
+        'delete',
+        '/api/recipes/{recipe}/shopping_cart/',
+    ),
+    ('users-list', 'get', '/api/users/'),
+    ('users-me', 'get', '/api/users/me/'),
+    ('users-detail', 'get', '/api/users/{author}/'),
+    ('users-subscriptions', 'get', '/api/users/subscriptions/'),
+    ('users-subscribe', 'post', '/api/users/{author}/subscribe/'),
+    ('users-unsubscribe', 'delete', '/api/users/{author}/subscribe/'),
+    ('tags-list', 'get', '/api/tags/'),
+    ('tags-detail', 'get', '/api/tags/{tag_id}/'),
+    ('ingredients-list', 'get', '/api/ingredients/'),
+    ('ingredients-search', 'get', '/api/ingredients/?name={ingredient}'),
+)
+AUTH_ROUTES = frozenset(
+    (
+        'recipes-feed',
+        'recipes-download',
+        'recipes-favorite-add',
+        'recipes-favorite-remove',
+        'recipes-cart-add',
+        'recipes-cart-remove',
+        'recipes-create',
+        'recipes-update',
+        'recipes-delete',
+        'users-me',
+        'users-subscriptions',
+        'users-subscribe',
+        'users-unsubscribe',
+    )
+)
+DATA_ROUTES = frozenset(('recipes-create', 'recipes-update'))
+
+
+def get_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def get_routes(methods=None, authenticated=True):
+    """Маршруты API с адресами и телами, заполненными данными из базы.
+
+    Изменяющие запросы идут парами (добавить и удалить), поэтому
+    повторный прогон видит базу в исходном состоянии. Рецепт создаётся,
+    меняется и удаляется подряд; его id подставляется в адрес вместо
+    {created} при выполнении, см. RouteRunner. Без authenticated
+    маршруты, доступные только пользователю, пропускаются.
+    """
+    recipe = Recipe.objects.select_related('author').first()
+    tag = Tag.objects.first()
+    if recipe is None or tag is None:
+        raise ValueError('Для замеров нужны хотя бы один рецепт и один тег')
+    ingredient = recipe.ingredients.first()
+    params = {
+        'recipe': recipe.id,
+        'author': recipe.author_id,
+        'tag': tag.slug,
+        'tag_id': tag.id,
+        'query': recipe.name.split()[0],
+        'ingredient': ingredient.name[:2] if ingredient else 'а',
+        'ingredient_id': ingredient.id if ingredient else 0,
+    }
+    data = {
+        'ingredients': (
+            [{'id': ingredient.id, 'amount': 1}] if ingredient else []
+        ),
+        'tags': [tag.id],
+        'image': get_image(),
+        'name': 'Замер',
+        'text': 'Рецепт для замеров',
+        'cooking_time': 1,
+    }
+    return [
+        (
+            name,
+            method,
+            url.format(created='{created}', **params),
+            data if name in DATA_ROUTES else None,
+        )
+        for name, method, url in ROUTES
+        if (methods is None or method in methods)
+        and (authenticated or name not in AUTH_ROUTES)
+    ]
+
+
+def get_client(user=None):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+def request(client, method, url, data=None):
+    """Выполняет запрос, дочитывая потоковые ответы, и собирает SQL."""
+    with CaptureQueriesContext(connection) as context:
+        if data is None:
+            response = getattr(client, method)(url)
+        else:
+            response = getattr(client, method)(url, data, format='json')
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+    return response, content, context.captured_queries
+
+
+def explain(sql):
+    prefix = connection.ops.explain_query_prefix()
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}')
+        return [
+            ' '.join(str(column) for column in row)
+            for row in cursor.fetchall()
+        ]
+
+
+class RouteRunner:
+    """Выполняет маршруты get_routes, подставляя id созданного рецепта."""
+
+    def __init__(self, client):
+        self.client = client
+        self.created = None
+
+    def __call__(self, name, method, url, data):
+        url = url.replace('{created}', str(self.created))
+        response, content, queries = request(self.client, method, url, data)
+        if name == 'recipes-create' and response.status_code == 201:
+            self.created = response.json()['id']
+        return response, content, queries
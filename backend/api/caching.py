@@ -0,0 +1,111 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from api.models import ModelVersion
+
+VERSION_KEY = 'model-version:{}'
+RESPONSE_KEY = 'api-response:{}'
+
+
+def get_version_key(model):
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def get_cached_model_version(model):
+    """Метка версии из кеша или None, без обращения к базе."""
+    return cache.get(get_version_key(model))
+
+
+def get_model_version(model):
+    """Метка версии данных модели - время последнего изменения.
+
+    Метка хранится в таблице ModelVersion, общей для всех процессов, и
+    кешируется на MODEL_VERSION_TTL секунд. Изменение, сделанное другим
+    процессом или командой manage.py, становится видно не позже чем
+    через это время, даже если кеш у каждого процесса свой. Пока модель
+    ни разу не менялась, версия равна нулю.
+    """
+    key = get_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        version = (
+            ModelVersion.objects.filter(model=model._meta.label_lower)
+            .values_list('version', flat=True)
+            .first()
+        ) or 0.0
+        cache.set(key, version, settings.MODEL_VERSION_TTL)
+    return version
+
+
+def bump_model_version(model):
+    """Записывает новую метку версии в транзакции, которая меняет данные.
+
+    Кеш текущего процесса сбрасывается после фиксации, поэтому ответ,
+    прочитанный до фиксации, не попадёт в кеш под новой версией.
+    """
+    ModelVersion.objects.update_or_create(
+        model=model._meta.label_lower, defaults={'version': time.time()}
+    )
+    key = get_version_key(model)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def get_etag(version, request):
+    path = request.get_full_path()
+    return quote_etag(hashlib.md5(f'{version}:{path}'.encode()).hexdigest())
+
+
+def set_validators(response, etag, last_modified):
+    """Заголовки для проверки ответа по версии данных.
+
+    no-cache требует проверять ETag при каждом запросе, иначе браузер
+    может счесть ответ свежим по Last-Modified и не спросить сервер.
+    """
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+
+
+class CachedResponseMixin:
+    """Кеширование ответов для редко меняющихся справочников.
+
+    Ответ хранится в кеше под ключом, зависящим от версии модели и
+    адреса запроса. Клиент получает ETag и Last-Modified и при повторном
+    запросе с совпадающей версией получает 304 без обращения к базе.
+    """
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        version = get_model_version(self.queryset.model)
+        etag = get_etag(version, request)
+        last_modified = int(version)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            return response
+        key = RESPONSE_KEY.format(etag)
+        data = cache.get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        else:
+            response = Response(data)
+        set_validators(response, etag, last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
@@ -0,0 +1,113 @@
+import base64
+import binascii
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
+from rest_framework import serializers
+
+from recipes.images import MAX_PIXELS
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+IMAGE_FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
+
+class Base64ImageField(serializers.ImageField):
+    """Изображение в base64 или data URL с ограничением памяти.
+
+    Размер проверяется по длине строки до декодирования. Строка
+    декодируется частями во временный файл, который остаётся в памяти
+    только до SPOOL_SIZE байт. Формат и размеры в пикселях читаются
+    из заголовка изображения один раз, без полного декодирования.
+    """
+
+    empty_values = (None, '', [], (), {})
+    default_error_messages = {
+        'invalid': 'Некорректное изображение в base64.',
+        'too_large': 'Размер изображения больше {max_size} байт.',
+        'too_many_pixels': 'Изображение больше {max_pixels} пикселей.',
+        'invalid_image': 'Загрузите изображение JPEG, PNG, GIF или WebP.',
+    }
+
+    def to_internal_value(self, data):
+        if data in self.empty_values:
+            return None
+        if not isinstance(data, str):
+            self.fail('invalid')
+        start = data.find(';base64,')
+        start = 0 if start == -1 else start + len(';base64,')
+        length = len(data) - start
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if length // 4 * 3 - data.count('=', -2) > max_size:
+            self.fail('too_large', max_size=max_size)
+        file = SpooledTemporaryFile(
+            max_size=SPOOL_SIZE, dir=settings.FILE_UPLOAD_TEMP_DIR
+        )
+        try:
+            for position in range(start, len(data), CHUNK_SIZE):
+                file.write(
+                    base64.b64decode(
+                        data[position:position + CHUNK_SIZE], validate=True
+                    )
+                )
+            extension = self.probe(file)
+        except binascii.Error:
+            file.close()
+            self.fail('invalid')
+        except serializers.ValidationError:
+            file.close()
+            raise
+        file.seek(0)
+        return File(file, name=f'{uuid.uuid4()}.{extension}')
+
+    def probe(self, file):
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                image_format = image.format
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.fail('too_many_pixels', max_pixels=MAX_PIXELS)
+        except OSError:
+            self.fail('invalid_image')
+        if image_format not in IMAGE_FORMATS:
+            self.fail('invalid_image')
+        if width * height > MAX_PIXELS:
+            self.fail('too_many_pixels', max_pixels=MAX_PIXELS)
+        return IMAGE_FORMATS[image_format]
+
+
+class PrimaryKeyListField(serializers.ListField):
+    """Список первичных ключей, объекты загружаются одним запросом.
+
+    В отличие от PrimaryKeyRelatedField(many=True), который делает
+    запрос на каждый ключ.
+    """
+
+    child = serializers.IntegerField()
+    default_error_messages = {
+        'does_not_exist': 'Объекты с id {pks} не существуют.',
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        pks = super().to_internal_value(data)
+        objects = self.queryset.in_bulk(pks)
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            self.fail('does_not_exist', pks=missing)
+        return [objects[pk] for pk in pks]
+
+    def to_representation(self, data):
+        return [obj.pk for obj in data.all()]
@@ -1,17 +1,32 @@
 import django_filters as filters
 from django.core.exceptions import ValidationError
+from django.db.models import Case, Exists, IntegerField, OuterRef, Value, When
 
 from recipes.models import Ingredient, Recipe
-from users.models import User
+from recipes.ranking import RANKINGS, get_ranking_ordering
+from recipes.search import search_recipes
 
 
 class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(field_name='name', lookup_expr='istartswith')
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def filter_name(self, queryset, name, value):
+        return (
+            queryset.filter(name__icontains=value)
+            .annotate(
+                is_prefix=Case(
+                    When(name__istartswith=value, then=Value(0)),
+                    default=Value(1),
+                    output_field=IntegerField(),
+                )
+            )
+            .order_by('is_prefix', 'name')
+        )
+
 
 class TagsMultipleChoiceField(filters.fields.MultipleChoiceField):
     def validate(self, value):
@@ -28,32 +43,62 @@ class TagsMultipleChoiceField(filters.fields.MultipleChoiceField):
                 )
 
 
-class TagsFilter(filters.AllValuesMultipleFilter):
+class TagsFilter(filters.Filter):
     field_class = TagsMultipleChoiceField
 
 
 class RecipeFilter(filters.FilterSet):
-    author = filters.ModelChoiceFilter(queryset=User.objects.all())
+    author = filters.NumberFilter(field_name='author')
     is_in_shopping_cart = filters.BooleanFilter(
-        widget=filters.widgets.BooleanWidget(), label='В корзине.'
+        method='get_is_in_shopping_cart',
+        widget=filters.widgets.BooleanWidget(),
+        label='В корзине.',
     )
     is_favorited = filters.BooleanFilter(
-        widget=filters.widgets.BooleanWidget(), label='В избранных.'
+        method='get_is_favorited',
+        widget=filters.widgets.BooleanWidget(),
+        label='В избранных.',
+    )
+    tags = TagsFilter(method='get_tags', label='Ссылка')
+    search = filters.CharFilter(method='get_search', label='Поиск')
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in RANKINGS],
+        method='get_ranking',
+        label='Сортировка',
     )
-    tags = TagsFilter(field_name='tags__slug', label='Ссылка')
 
     class Meta:
         model = Recipe
-        fields = ['is_favorited', 'is_in_shopping_cart', 'author', 'tags']
+        fields = [
+            'is_favorited',
+            'is_in_shopping_cart',
+            'author',
+            'tags',
+            'search',
+            'ordering',
+        ]
 
     def get_is_favorited(self, queryset, name, data):
         if data and not self.request.user.is_anonymous:
-            return queryset.filter(favorite_recipe__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, data):
         if data and not self.request.user.is_anonymous:
-            return queryset.filter(
-                shopping_cart_recipe__user=self.request.user
-            )
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
+
+    def get_tags(self, queryset, name, data):
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'), tag__slug__in=data
+                )
+            )
+        )
+
+    def get_search(self, queryset, name, data):
+        return search_recipes(queryset, data)
+
+    def get_ranking(self, queryset, name, data):
+        return queryset.order_by(*get_ranking_ordering(data))
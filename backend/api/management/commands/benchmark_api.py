@@ -0,0 +1,152 @@
+import json
+import math
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import RouteRunner, get_client, get_routes
+from users.models import User
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = math.ceil(percent / 100 * len(values)) - 1
+    return values[max(index, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку и число SQL-запросов маршрутов API и '
+        'сравнивает их с сохранённым базовым уровнем.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email', help='Пользователь, от имени которого идут запросы.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20, help='Повторов на маршрут.'
+        )
+        parser.add_argument(
+            '--baseline', help='JSON с базовым уровнем для сравнения.'
+        )
+        parser.add_argument(
+            '--output', help='Файл для сохранения результатов в JSON.'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=20.0,
+            help='Допустимый рост p95 в процентах.',
+        )
+        parser.add_argument(
+            '--min-delta',
+            type=float,
+            default=5.0,
+            help='Рост p95 в мс, меньше которого регрессия не считается.',
+        )
+
+    def warm_up(self, run, routes):
+        """Первый прогон: прогревает кеши и отбрасывает упавшие маршруты."""
+        working = []
+        for route in routes:
+            try:
+                run(*route)
+            except Exception as error:
+                self.stdout.write(
+                    self.style.ERROR(f'{route[0]}: пропущен, {error!r}')
+                )
+            else:
+                working.append(route)
+        return working
+
+    def measure(self, client, routes, repeat):
+        """Прогоняет все маршруты по кругу repeat раз.
+
+        Маршруты идут в исходном порядке, поэтому добавление и удаление
+        из одной пары всегда чередуются. Первый прогон прогревает кеши
+        и в замеры не входит.
+        """
+        run = RouteRunner(client)
+        routes = self.warm_up(run, routes)
+        timings = {name: [] for name, _, _, _ in routes}
+        results = {}
+        for _ in range(repeat):
+            for name, method, url, data in routes:
+                start = time.perf_counter()
+                response, _, queries = run(name, method, url, data)
+                timings[name].append((time.perf_counter() - start) * 1000)
+                results[name] = {
+                    'method': method.upper(),
+                    'url': url,
+                    'status': response.status_code,
+                    'queries': len(queries),
+                }
+        for name, result in results.items():
+            result['p50_ms'] = round(statistics.median(timings[name]), 2)
+            result['p95_ms'] = round(percentile(timings[name], 95), 2)
+        return results
+
+    def compare(self, results, baseline, threshold, min_delta):
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if result['queries'] > previous['queries']:
+                regressions.append(
+                    f'{name}: SQL-запросов {previous["queries"]} -> '
+                    f'{result["queries"]}'
+                )
+            limit = max(
+                previous['p95_ms'] * (1 + threshold / 100),
+                previous['p95_ms'] + min_delta,
+            )
+            if result['p95_ms'] > limit:
+                regressions.append(
+                    f'{name}: p95 {previous["p95_ms"]} -> '
+                    f'{result["p95_ms"]} мс'
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        user = None
+        if options['email']:
+            user = User.objects.filter(email=options['email']).first()
+            if user is None:
+                raise CommandError('Пользователь не найден')
+        try:
+            routes = get_routes(authenticated=user is not None)
+        except ValueError as error:
+            raise CommandError(error)
+        results = self.measure(
+            get_client(user), routes, max(options['repeat'], 1)
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:28} {result["status"]} '
+                f'{result["queries"]:4} запр. '
+                f'p50 {result["p50_ms"]:8.2f} мс '
+                f'p95 {result["p95_ms"]:8.2f} мс'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(
+                    results, output, ensure_ascii=False, indent=2,
+                    sort_keys=True,
+                )
+                output.write('\n')
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline:
+                regressions = self.compare(
+                    results,
+                    json.load(baseline),
+                    options['threshold'],
+                    options['min_delta'],
+                )
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f'Регрессий: {len(regressions)}')
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,70 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость запроса к базе с новым соединением, '
+        'с постоянным соединением и с проверкой соединения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=500, help='Замеров на режим.'
+        )
+        parser.add_argument(
+            '--rate',
+            type=int,
+            default=100,
+            help='Запросов в секунду для оценки суммарных затрат.',
+        )
+
+    def query(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+
+    def new_connection(self):
+        connection.close()
+        self.query()
+
+    def persistent(self):
+        self.query()
+
+    def health_check(self):
+        if not connection.is_usable():
+            connection.close()
+        self.query()
+
+    def measure(self, function, requests):
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.mean(timings)
+
+    def handle(self, *args, **options):
+        requests = max(options['requests'], 1)
+        self.query()
+        results = {
+            'Новое соединение': self.measure(self.new_connection, requests),
+            'Постоянное соединение': self.measure(self.persistent, requests),
+            'С проверкой соединения': self.measure(
+                self.health_check, requests
+            ),
+        }
+        connection.close()
+        for name, mean in results.items():
+            self.stdout.write(f'{name:24} {mean:8.3f} мс')
+        overhead = (
+            results['Новое соединение'] - results['Постоянное соединение']
+        )
+        self.stdout.write(
+            f'Подключение на каждый запрос: +{overhead:.3f} мс, '
+            f'{overhead * options["rate"] / 1000:.2f} с в секунду '
+            f'при {options["rate"]} запросах в секунду'
+        )
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from api.benchmark import get_client, request
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ответы списка и карточек рецептов в быстром '
+        'представлении с ответами RecipesListSerializer байт в байт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email', help='Пользователь, от имени которого идут запросы.'
+        )
+        parser.add_argument(
+            '--pages', type=int, default=5, help='Сколько страниц сравнить.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=6, help='Рецептов на странице.'
+        )
+
+    def get_content(self, client, url, fast):
+        with override_settings(RECIPES_FAST_REPRESENTATION=fast):
+            response, content, _ = request(client, 'get', url)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: статус {response.status_code}')
+        return content, response.json()
+
+    def compare(self, client, url):
+        expected, data = self.get_content(client, url, fast=False)
+        content, _ = self.get_content(client, url, fast=True)
+        if content != expected:
+            self.stdout.write(self.style.ERROR(f'{url}: ответы различаются'))
+            return data, False
+        return data, True
+
+    def handle(self, *args, **options):
+        user = None
+        if options['email']:
+            user = User.objects.filter(email=options['email']).first()
+            if user is None:
+                raise CommandError('Пользователь не найден')
+        client = get_client(user)
+        url = f'/api/recipes/?limit={options["limit"]}'
+        checked = failed = 0
+        for _ in range(options['pages']):
+            page, ok = self.compare(client, url)
+            results = [ok] + [
+                self.compare(client, f'/api/recipes/{item["id"]}/')[1]
+                for item in page['results']
+            ]
+            checked += len(results)
+            failed += results.count(False)
+            url = page['next']
+            if url is None:
+                break
+        if failed:
+            raise CommandError(f'Различий: {failed} из {checked}')
+        self.stdout.write(
+            self.style.SUCCESS(f'Ответы совпадают: {checked} проверок')
+        )
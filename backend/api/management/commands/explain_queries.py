@@ -0,0 +1,66 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import explain, get_client, get_routes, request
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Сохраняет планы выполнения SQL-запросов для маршрутов API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email', help='Пользователь, от имени которого идут запросы.'
+        )
+        parser.add_argument(
+            '--output', help='Файл для сохранения планов в формате JSON.'
+        )
+
+    def get_plan(self, client, method, url):
+        response, _, queries = request(client, method, url)
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': [
+                {'sql': query['sql'], 'plan': explain(query['sql'])}
+                for query in queries
+                if query['sql'].lstrip().upper().startswith('SELECT')
+            ],
+        }
+
+    def write_plan(self, name, plan):
+        self.stdout.write(
+            f'{name}: {plan["status"]}, {len(plan["queries"])} запросов'
+        )
+        for query in plan['queries']:
+            self.stdout.write(f'  {query["sql"]}')
+            for line in query['plan']:
+                self.stdout.write(f'    {line}')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['email']:
+            user = User.objects.filter(email=options['email']).first()
+            if user is None:
+                raise CommandError('Пользователь не найден')
+        try:
+            routes = get_routes(
+                methods=('get',), authenticated=user is not None
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        client = get_client(user)
+        plans = {}
+        for name, method, url, _ in routes:
+            try:
+                plans[name] = self.get_plan(client, method, url)
+            except Exception as error:
+                self.stdout.write(
+                    self.style.ERROR(f'{name}: пропущен, {error!r}')
+                )
+                continue
+            self.write_plan(name, plans[name])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(plans, output, ensure_ascii=False, indent=2)
@@ -0,0 +1,137 @@
+import asyncio
+import itertools
+import time
+from collections import Counter
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.commands.benchmark_api import percentile
+
+DEFAULT_PATHS = ('/api/tags/', '/api/ingredients/?name=а')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест работающего сервера: держит заданное число '
+        'одновременных keep-alive соединений и считает пропускную '
+        'способность, задержки и ошибки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000', help='Адрес сервера.'
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Путь запроса, можно указать несколько раз.',
+        )
+        parser.add_argument(
+            '--connections',
+            type=int,
+            default=100,
+            help='Число одновременных соединений.',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10.0, help='Длительность, с.'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=10.0, help='Таймаут ответа, с.'
+        )
+
+    async def fetch(self, reader, writer, path):
+        writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\n'
+            'Accept: application/json\r\n\r\n'.encode()
+        )
+        await writer.drain()
+        head = await reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        await reader.readexactly(int(headers.get('content-length', 0)))
+        return int(status_line.split()[1]), headers
+
+    async def client(self, paths, deadline, timeout, stats):
+        reader = writer = None
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port),
+                        timeout,
+                    )
+                status, headers = await asyncio.wait_for(
+                    self.fetch(reader, writer, next(paths)), timeout
+                )
+            except (OSError, asyncio.TimeoutError,
+                    asyncio.IncompleteReadError) as error:
+                stats['errors'][type(error).__name__] += 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                continue
+            stats['latencies'].append((time.monotonic() - start) * 1000)
+            stats['statuses'][status] += 1
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    async def run(self, paths, connections, duration, timeout):
+        stats = {
+            'latencies': [],
+            'statuses': Counter(),
+            'errors': Counter(),
+        }
+        deadline = time.monotonic() + duration
+        paths = itertools.cycle(paths)
+        await asyncio.gather(
+            *(
+                self.client(paths, deadline, timeout, stats)
+                for _ in range(connections)
+            )
+        )
+        return stats
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Поддерживаются только адреса http://')
+        self.host = url.hostname
+        self.port = url.port or 80
+        paths = [
+            quote(path, safe='/?=&')
+            for path in options['paths'] or DEFAULT_PATHS
+        ]
+        stats = asyncio.run(
+            self.run(
+                paths,
+                options['connections'],
+                options['duration'],
+                options['timeout'],
+            )
+        )
+        latencies = stats['latencies']
+        self.stdout.write(
+            f'Соединений: {options["connections"]}, '
+            f'запросов: {len(latencies)}, '
+            f'в секунду: {len(latencies) / options["duration"]:.1f}'
+        )
+        if latencies:
+            self.stdout.write(
+                f'p50 {percentile(latencies, 50):.1f} мс, '
+                f'p95 {percentile(latencies, 95):.1f} мс, '
+                f'p99 {percentile(latencies, 99):.1f} мс'
+            )
+        self.stdout.write(f'Статусы: {dict(stats["statuses"])}')
+        if stats['errors']:
+            self.stdout.write(
+                self.style.ERROR(f'Ошибки: {dict(stats["errors"])}')
+            )
@@ -0,0 +1,252 @@
+import asyncio
+import contextvars
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+current_metrics = contextvars.ContextVar('current_metrics', default=None)
+
+FINGERPRINT_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """SQL без литералов: одинаковые запросы с разными параметрами."""
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class RequestMetrics:
+    """Метрики одного запроса: SQL, сериализация, размер ответа."""
+
+    def __init__(self):
+        self.view = None
+        self.query_budget = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialization_time = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated_queries(self):
+        return {
+            sql: count
+            for sql, count in self.fingerprints.items()
+            if count >= settings.QUERY_REPEAT_THRESHOLD
+        }
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Передаёт SQL-запрос в метрики текущего запроса, если они есть.
+
+    Подключается к каждому соединению с базой при его создании. Метрики
+    берутся из contextvar, поэтому запросы учитываются и в потоке, где
+    выполняется синхронное представление при работе через ASGI.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_execute_wrapper(connection, **kwargs):
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+class MetricsRegistry:
+    """Накопленные в процессе метрики в формате Prometheus."""
+
+    metrics = (
+        ('requests_total', 'Количество запросов.'),
+        ('queries_total', 'Количество SQL-запросов.'),
+        ('sql_seconds_total', 'Время выполнения SQL.'),
+        ('serialization_seconds_total', 'Время сериализации.'),
+        ('duration_seconds_total', 'Полное время обработки запроса.'),
+        ('response_bytes_total', 'Размер ответов.'),
+        ('repeated_queries_total', 'Запросы с признаками N+1.'),
+        ('budget_exceeded_total', 'Превышения бюджета запросов.'),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+
+    def observe(self, view, **values):
+        with self._lock:
+            for name, value in values.items():
+                self._values[name, view] += value
+
+    def export(self):
+        lines = []
+        with self._lock:
+            values = dict(self._values)
+        for name, description in self.metrics:
+            metric = f'foodgram_{name}'
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} counter')
+            for (value_name, view), value in sorted(values.items()):
+                if value_name == name:
+                    lines.append(f'{metric}{{view="{view}"}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class QueryMetricsMiddleware:
+    """Считает SQL-запросы и время обработки для каждого представления.
+
+    Результат добавляется в заголовок Server-Timing и в общий реестр,
+    доступный по адресу /metrics. Повторяющиеся запросы логируются как
+    вероятный N+1, превышение бюджета в строгом режиме вызывает ошибку.
+    Работает и в синхронной, и в асинхронной цепочке middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = request.metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.process(request, response, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = request.metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.process(request, response, time.perf_counter() - start)
+
+    def process(self, request, response, duration):
+        metrics = request.metrics
+        view = metrics.view or getattr(
+            request.resolver_match, 'view_name', None
+        )
+        if view is None:
+            return response
+        repeated = metrics.repeated_queries()
+        for sql, count in repeated.items():
+            logger.warning('%s: запрос выполнен %s раз: %s', view, count, sql)
+        exceeded = (
+            metrics.query_budget is not None
+            and metrics.queries > metrics.query_budget
+        )
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(
+            view,
+            requests_total=1,
+            queries_total=metrics.queries,
+            sql_seconds_total=metrics.sql_time,
+            serialization_seconds_total=metrics.serialization_time,
+            duration_seconds_total=duration,
+            response_bytes_total=size,
+            repeated_queries_total=len(repeated),
+            budget_exceeded_total=int(exceeded),
+        )
+        response['Server-Timing'] = ', '.join(
+            (
+                f'db;dur={metrics.sql_time * 1000:.1f};'
+                f'desc="{metrics.queries} queries"',
+                f'ser;dur={metrics.serialization_time * 1000:.1f}',
+                f'total;dur={duration * 1000:.1f}',
+            )
+        )
+        if exceeded:
+            message = (
+                f'{view}: {metrics.queries} SQL-запросов '
+                f'при бюджете {metrics.query_budget}'
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class QueryBudgetMixin:
+    """Передаёт в метрики имя действия, бюджет и время сериализации.
+
+    query_budget - число или словарь {действие: число} с максимальным
+    количеством SQL-запросов на один запрос к представлению.
+    """
+
+    query_budget = None
+
+    def get_query_budget(self):
+        if isinstance(self.query_budget, dict):
+            return self.query_budget.get(self.action)
+        return self.query_budget
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        metrics = getattr(request._request, 'metrics', None)
+        if metrics is not None:
+            metrics.view = f'{self.basename}-{self.action}'
+            metrics.query_budget = self.get_query_budget()
+
+    def time_serialization(self, function):
+        """Добавляет время вызовов function ко времени сериализации."""
+        metrics = getattr(self.request._request, 'metrics', None)
+        if metrics is None:
+            return function
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.serialization_time += time.perf_counter() - start
+
+        return timed
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        serializer.to_representation = self.time_serialization(
+            serializer.to_representation
+        )
+        return serializer
+
+
+def metrics_view(request):
+    return HttpResponse(
+        registry.export(), content_type='text/plain; version=0.0.4'
+    )
@@ -0,0 +1,13 @@
+from django.db import models
+
+
+class ModelVersion(models.Model):
+    model = models.CharField('Модель', max_length=100, primary_key=True)
+    version = models.FloatField('Версия')
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self):
+        return f'{self.model}: {self.version}'
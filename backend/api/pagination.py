@@ -1,6 +1,235 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from recipes.feed import get_feed_count, get_feed_ids
+from recipes.ranking import RANKINGS, get_ranking_ordering
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(BasePagination):
+    """Пагинация по ключу (pub_date, id) без OFFSET.
+
+    Ссылки next и previous содержат курсор с ключом крайнего рецепта
+    страницы, поэтому стоимость запроса не зависит от глубины страницы.
+    С параметром ordering=popular|trending ключом служит (оценка, id).
+    Оценки меняет update_recipe_scores, поэтому при обходе по курсору
+    рецепт, чья оценка изменилась между страницами, может пропасть из
+    выдачи или встретиться второй раз. Снимок оценок не фиксируется:
+    для рейтинга это допустимо, а порядок по дате не меняется.
+    Параметр page поддерживается как точка входа: страница N читается
+    через OFFSET, и её стоимость растёт с номером. Фронтенд переходит на
+    соседние страницы по ссылкам next и previous, а page использует
+    только для перехода на произвольную страницу. Страница может
+    состоять из объектов или словарей values(). Общее количество
+    берётся из статистики PostgreSQL или из кеша; для фильтров по
+    избранному и корзине пользователя оно считается заново, чтобы
+    добавленный рецепт сразу учитывался.
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_query_param = 'page'
+    ordering_query_param = 'ordering'
+    ordering = ('-pub_date', '-id')
+    count_cache_timeout = 60
+    estimate_threshold = 100000
+    uncached_count_params = ('is_favorited', 'is_in_shopping_cart')
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if limit <= 0:
+            return self.page_size
+        return min(limit, self.max_page_size)
+
+    def get_ordering(self, request):
+        ranking = request.query_params.get(self.ordering_query_param)
+        if ranking in RANKINGS:
+            return get_ranking_ordering(ranking)
+        return self.ordering
+
+    @property
+    def key_field(self):
+        return self.ordering[0].lstrip('-')
+
+    def get_key(self, recipe):
+        if isinstance(recipe, dict):
+            return recipe[self.key_field], recipe['id']
+        return getattr(recipe, self.key_field), recipe.id
+
+    def encode_cursor(self, recipe, reverse=False):
+        value, pk = self.get_key(recipe)
+        if self.key_field == 'pub_date':
+            value = value.isoformat()
+        position = {'r': reverse, 'd': value, 'i': pk}
+        cursor = base64.urlsafe_b64encode(json.dumps(position).encode())
+        return replace_query_param(
+            remove_query_param(
+                self.request.build_absolute_uri(), self.page_query_param
+            ),
+            self.cursor_query_param,
+            cursor.decode(),
+        )
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is None:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if self.key_field == 'pub_date':
+                value = parse_datetime(position['d'])
+                if value is None:
+                    raise ValueError
+            else:
+                value = float(position['d'])
+            return bool(position['r']), value, int(position['i'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_count(self, queryset):
+        params = sorted(
+            (key, value)
+            for key, value in self.request.query_params.lists()
+            if key not in (
+                self.cursor_query_param,
+                self.page_query_param,
+                self.page_size_query_param,
+                self.ordering_query_param,
+            )
+        )
+        if not params and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.estimate_threshold:
+                return int(row[0])
+        if self.request.user.is_authenticated and any(
+            key in self.uncached_count_params for key, _ in params
+        ):
+            return queryset.count()
+        key = 'recipes-count:' + hashlib.md5(
+            json.dumps([self.request.user.id, params]).encode()
+        ).hexdigest()
+        return cache.get_or_set(
+            key, queryset.count, self.count_cache_timeout
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.ordering = self.get_ordering(request)
+        self.count = self.get_count(queryset)
+        cursor = self.decode_cursor(request)
+        queryset = queryset.order_by(*self.ordering)
+        if cursor is None:
+            try:
+                page = max(int(request.query_params[self.page_query_param]), 1)
+            except (KeyError, ValueError):
+                page = 1
+            offset = (page - 1) * self.limit
+            results = list(queryset[offset:offset + self.limit + 1])
+            self.has_previous = page > 1
+            self.has_next = len(results) > self.limit
+            self.page = results[:self.limit]
+            return self.page
+        reverse, value, pk = cursor
+        field = self.key_field
+        if reverse:
+            queryset = queryset.filter(
+                Q(**{f'{field}__gt': value})
+                | Q(**{field: value, 'id__gt': pk})
+            ).order_by(field, 'id')
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': value})
+                | Q(**{field: value, 'id__lt': pk})
+            )
+        results = list(queryset[:self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if reverse:
+            results.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = True, has_more
+        self.page = results
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ('count', self.count),
+                    ('next', self.get_next_link()),
+                    ('previous', self.get_previous_link()),
+                    ('results', data),
+                ]
+            )
+        )
+
+
+class FeedPagination(RecipeCursorPagination):
+    """Пагинация ленты подписок по ключу (pub_date, id), только вперёд.
+
+    Id рецептов страницы выбирает get_feed_ids, затем рецепты читаются
+    из переданного queryset. Количество - сумма рецептов авторов.
+    """
+
+    def get_count(self, queryset):
+        return get_feed_count(self.request.user)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.count = self.get_count(queryset)
+        cursor = self.decode_cursor(request)
+        position = None
+        if cursor is not None:
+            reverse, pub_date, pk = cursor
+            if reverse:
+                raise NotFound(self.invalid_cursor_message)
+            position = (pub_date, pk)
+        ids = get_feed_ids(request.user, position, self.limit + 1)
+        self.has_previous = False
+        self.has_next = len(ids) > self.limit
+        ids = ids[:self.limit]
+        recipes = {
+            self.get_key(recipe)[1]: recipe
+            for recipe in queryset.filter(id__in=ids)
+        }
+        self.page = [recipes[pk] for pk in ids if pk in recipes]
+        return self.page
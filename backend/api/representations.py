@@ -0,0 +1,176 @@
+from collections import defaultdict
+
+from django.core.exceptions import ImproperlyConfigured
+
+from api.serializers import (RecipesListSerializer, get_followed_ids,
+                             get_image_renditions)
+from recipes.models import Recipe, RecipeIngredient
+
+RECIPE_COLUMNS = (
+    'id',
+    'name',
+    'image',
+    'image_width',
+    'text',
+    'cooking_time',
+    'pub_date',
+    'popularity',
+    'trending',
+    'author_id',
+    'author__email',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+)
+RECIPE_ANNOTATIONS = (
+    'is_favorited',
+    'is_in_shopping_cart',
+    'author_is_subscribed',
+)
+
+
+class RecipeRepresentation:
+    """Представление рецептов для чтения без полей DRF.
+
+    Рецепты читаются через values(), теги и ингредиенты страницы - двумя
+    запросами values_list. План вывода собирается один раз по списку
+    полей RecipesListSerializer, поэтому JSON совпадает с ответом
+    сериализатора, а новое поле без обработчика сразу даёт ошибку.
+    Поля-аннотации пропускаются, если их нет в queryset, как и в DRF.
+    """
+
+    serializer_class = RecipesListSerializer
+
+    def __init__(self):
+        self.plan = tuple(
+            (field, self.get_getter(field))
+            for field in self.serializer_class.Meta.fields
+        )
+        self.image_storage = Recipe._meta.get_field('image').storage
+
+    def get_getter(self, field):
+        getter = getattr(self, f'get_{field}', None)
+        if getter is None:
+            raise ImproperlyConfigured(
+                f'{type(self).__name__}: нет обработчика для поля {field}'
+            )
+        return getter
+
+    def get_columns(self, queryset):
+        return RECIPE_COLUMNS + tuple(
+            name for name in RECIPE_ANNOTATIONS
+            if name in queryset.query.annotations
+        )
+
+    def values(self, queryset):
+        return queryset.values(*self.get_columns(queryset))
+
+    def get_id(self, row, context):
+        return row['id']
+
+    def get_tags(self, row, context):
+        return context['tags'].get(row['id'], [])
+
+    def get_author(self, row, context):
+        if 'author_is_subscribed' in row:
+            is_subscribed = row['author_is_subscribed']
+        elif context['followed_ids'] is not None:
+            is_subscribed = row['author_id'] in context['followed_ids']
+        else:
+            is_subscribed = False
+        return {
+            'email': row['author__email'],
+            'id': row['author_id'],
+            'username': row['author__username'],
+            'first_name': row['author__first_name'],
+            'last_name': row['author__last_name'],
+            'is_subscribed': is_subscribed,
+        }
+
+    def get_ingredients(self, row, context):
+        return context['ingredients'].get(row['id'], [])
+
+    def get_is_favorited(self, row, context):
+        return row['is_favorited']
+
+    def get_is_in_shopping_cart(self, row, context):
+        return row['is_in_shopping_cart']
+
+    def get_name(self, row, context):
+        return row['name']
+
+    def get_image(self, row, context):
+        if not row['image']:
+            return None
+        url = self.image_storage.url(row['image'])
+        if context['request'] is not None:
+            return context['request'].build_absolute_uri(url)
+        return url
+
+    def get_image_renditions(self, row, context):
+        return get_image_renditions(
+            row['image'], row['image_width'], context['request']
+        )
+
+    def get_text(self, row, context):
+        return row['text']
+
+    def get_cooking_time(self, row, context):
+        return row['cooking_time']
+
+    def get_context(self, rows, request):
+        ids = [row['id'] for row in rows]
+        tags = defaultdict(list)
+        for recipe_id, pk, name, color, slug in (
+            Recipe.tags.through.objects.filter(recipe_id__in=ids)
+            .order_by('tag_id')
+            .values_list(
+                'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+            )
+        ):
+            tags[recipe_id].append(
+                {'id': pk, 'name': name, 'color': color, 'slug': slug}
+            )
+        ingredients = defaultdict(list)
+        for recipe_id, pk, name, measurement_unit, amount in (
+            RecipeIngredient.objects.filter(recipe_id__in=ids).values_list(
+                'recipe_id',
+                'ingredient_id',
+                'ingredient__name',
+                'ingredient__measurement_unit',
+                'amount',
+            )
+        ):
+            ingredients[recipe_id].append(
+                {
+                    'id': pk,
+                    'name': name,
+                    'measurement_unit': measurement_unit,
+                    'amount': amount,
+                }
+            )
+        followed_ids = None
+        if request is not None and request.user.is_authenticated:
+            if rows and 'author_is_subscribed' not in rows[0]:
+                followed_ids = get_followed_ids(request)
+        return {
+            'request': request,
+            'tags': tags,
+            'ingredients': ingredients,
+            'followed_ids': followed_ids,
+        }
+
+    def render(self, rows, request=None):
+        rows = list(rows)
+        context = self.get_context(rows, request)
+        plan = [
+            (field, getter) for field, getter in self.plan
+            if field not in RECIPE_ANNOTATIONS or not rows or field in rows[0]
+        ]
+        return [
+            {field: getter(row, context) for field, getter in plan}
+            for row in rows
+        ]
+
+
+recipe_representation = RecipeRepresentation()
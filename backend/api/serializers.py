@@ -1,11 +1,57 @@
 # from drf_base64.fields import Base64ImageField
-from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 
+from api.fields import Base64ImageField, PrimaryKeyListField
+from recipes.images import get_renditions
+from recipes.matching import update_postings
 from recipes.models import Follow, Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import update_search_vectors
+from recipes.shopping_list import refresh_recipe
+from recipes.similarity import mark_stale
 from users.models import User
 
 
+def get_followed_ids(request):
+    """Множество id авторов, на которых подписан текущий пользователь.
+
+    Вычисляется одним запросом и кешируется на объекте запроса, поэтому
+    вложенные сериализаторы на одной странице не обращаются к базе повторно.
+    """
+    if not hasattr(request, '_followed_ids'):
+        request._followed_ids = set(
+            Follow.objects.filter(user=request.user).values_list(
+                'author_id', flat=True
+            )
+        )
+    return request._followed_ids
+
+
+def get_image_renditions(name, width, request=None):
+    """Ссылки на уменьшенные копии изображения рецепта.
+
+    Пока ширина оригинала неизвестна, копий нет и список пуст.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    renditions = []
+    for value, extension, rendition in get_renditions(name, width):
+        url = storage.url(rendition)
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        renditions.append({'width': value, 'format': extension, 'url': url})
+    return renditions
+
+
+class ImageRenditionsField(serializers.ReadOnlyField):
+    def to_representation(self, value):
+        return get_image_renditions(
+            value.name if value else None,
+            value.instance.image_width,
+            self.context.get('request'),
+        )
+
+
 class UserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
@@ -21,11 +67,12 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
-        user = request.user
-        return Follow.objects.filter(user=user, author=obj).exists()
+        return obj.id in get_followed_ids(request)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -73,6 +120,7 @@ class RecipesListSerializer(serializers.ModelSerializer):
     is_favorited = serializers.BooleanField(read_only=True)
     is_in_shopping_cart = serializers.BooleanField(read_only=True)
     image = Base64ImageField()
+    image_renditions = ImageRenditionsField(source='image')
 
     class Meta:
         model = Recipe
@@ -85,13 +133,19 @@ class RecipesListSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_renditions',
             'text',
             'cooking_time',
         )
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
 
 class AmountIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -104,8 +158,8 @@ class AmountIngredientSerializer(serializers.ModelSerializer):
 
 class RecipesCreateSerializer(serializers.ModelSerializer):
     ingredients = AmountIngredientSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
+    tags = PrimaryKeyListField(
+        queryset=Tag.objects.all(), allow_empty=False
     )
     image = Base64ImageField()
 
@@ -131,80 +185,140 @@ class RecipesCreateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_amount_ingredients(ingredients, recipe)
+        update_postings(
+            recipe.pk,
+            added={ingredient['id'].id for ingredient in ingredients},
+        )
+        update_search_vectors([recipe.pk])
+        mark_stale([recipe.pk])
         return recipe
 
+    def update_amount_ingredients(self, ingredients, recipe):
+        """Приводит состав рецепта к ingredients, меняя только разницу.
+
+        Возвращает старый и новый наборы id ингредиентов и id тех, у
+        которых поменялось количество.
+        """
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        rows = {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        changed = [
+            row
+            for pk, row in rows.items()
+            if pk in amounts and row.amount != amounts[pk]
+        ]
+        for row in changed:
+            row.amount = amounts[row.ingredient_id]
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe=recipe, ingredient_id=pk, amount=amount
+                )
+                for pk, amount in amounts.items()
+                if pk not in rows
+            ]
+        )
+        RecipeIngredient.objects.filter(
+            recipe=recipe, ingredient__in=rows.keys() - amounts.keys()
+        ).delete()
+        return set(rows), set(amounts), {row.ingredient_id for row in changed}
+
+    @transaction.atomic
     def update(self, obj, validated_data):
+        stale = False
         if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
-            obj.ingredients.clear()
-            self.create_amount_ingredients(ingredients, obj)
+            old, new, changed = self.update_amount_ingredients(
+                validated_data.pop('ingredients'), obj
+            )
+            update_postings(obj.pk, added=new - old, removed=old - new)
+            refresh_recipe(obj, (old ^ new) | changed)
+            stale = old != new
         if 'tags' in validated_data:
             tags = validated_data.pop('tags')
+            old = set(obj.tags.values_list('id', flat=True))
+            stale = stale or old != {tag.id for tag in tags}
             obj.tags.set(tags)
-        return super().update(obj, validated_data)
+        for field, value in validated_data.items():
+            setattr(obj, field, value)
+        obj.save(update_fields=list(validated_data))
+        update_search_vectors([obj.pk])
+        if stale:
+            mark_stale([obj.pk])
+        return obj
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'recipe',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            ),
+        )
         serializer = RecipesListSerializer(instance)
         return serializer.data
 
-    def validate(self, data):
-        ingredients = data['ingredients']
-        unique_ings = []
+    def validate_ingredients(self, ingredients):
+        pks = [ingredient['id'] for ingredient in ingredients]
+        if len(set(pks)) != len(pks):
+            raise serializers.ValidationError('Ингредиенты повторяются!')
+        objects = Ingredient.objects.in_bulk(pks)
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты с id {missing} не существуют.'
+            )
         for ingredient in ingredients:
-            name = ingredient['id']
-            if int(ingredient['amount']) <= 0:
+            ingredient['id'] = objects[ingredient['id']]
+            if ingredient['amount'] <= 0:
                 raise serializers.ValidationError(
-                    f'Не корректное количество для {name}'
+                    f'Не корректное количество для {ingredient["id"]}'
                 )
-            if name not in unique_ings:
-                unique_ings.append(name)
-            else:
-                raise serializers.ValidationError('Ингредиенты повторяются!')
-        return data
+        return ingredients
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField(source='image')
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_renditions',
             'cooking_time',
         )
 
 
-class FollowSerializer(serializers.ModelSerializer):
-    email = serializers.ReadOnlyField(source='author.email')
-    id = serializers.ReadOnlyField(source='author.id')
-    username = serializers.ReadOnlyField(source='author.username')
-    first_name = serializers.ReadOnlyField(source='author.first_name')
-    last_name = serializers.ReadOnlyField(source='author.last_name')
-    is_subscribed = serializers.SerializerMethodField()
+class FollowSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
-
-    class Meta:
-        model = User
-        fields = (
-            'email',
-            'id',
-            'username',
-            'first_name',
-            'last_name',
-            'is_subscribed',
-            'recipes',
-            'recipes_count',
-        )
+    recipes_count = serializers.IntegerField(read_only=True)
 
-    def get_is_subscribed(self, obj):
-        return Follow.objects.filter(user=obj.user, author=obj.author).exists()
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ('recipes', 'recipes_count')
 
     def get_recipes(self, obj):
-        queryset = Recipe.objects.filter(author=obj.author).order_by(
-            '-pub_date'
-        )[:3]
-        return FavoriteRecipeSerializer(queryset, many=True).data
+        return FavoriteRecipeSerializer(
+            obj.latest_recipes, many=True, context=self.context
+        ).data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
+
+class RecipeMatchSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=50,
+    )
+    mode = serializers.ChoiceField(
+        choices=('missing', 'all'), default='missing'
+    )
+    missing = serializers.IntegerField(
+        min_value=0, max_value=20, default=0
+    )
@@ -0,0 +1,131 @@
+import csv
+import io
+
+from django.conf import settings
+from django.db.models import F
+from django.http import StreamingHttpResponse
+
+from recipes.models import ShoppingListItem
+
+TITLE = 'Список покупок'
+FILENAME = 'shopping_list'
+
+
+def get_shopping_list(user):
+    """Сводный список ингредиентов из корзины пользователя.
+
+    Итоги заранее посчитаны в ShoppingListItem, поэтому строк не больше
+    числа ингредиентов, и они читаются сразу, в синхронном представлении.
+    Под ASGI генератор потокового ответа выполняется в цикле событий, где
+    обращаться к базе нельзя, поэтому рендереры получают готовый список.
+    """
+    return list(
+        ShoppingListItem.objects.filter(user=user)
+        .values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            ingredient_total=F('amount'),
+        )
+        .order_by('ingredient__name')
+    )
+
+
+class Echo:
+    """Буфер для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class TxtRenderer:
+    content_type = 'text/plain; charset=utf8'
+    extension = 'txt'
+
+    def render(self, rows):
+        yield f'{TITLE}: \n'
+        for row in rows:
+            yield (
+                f'{row["ingredient__name"]} - '
+                f'{row["ingredient_total"]} '
+                f'({row["ingredient__measurement_unit"]}), \n'
+            )
+
+
+class CsvRenderer:
+    content_type = 'text/csv; charset=utf8'
+    extension = 'csv'
+
+    def render(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('Ингредиент', 'Количество', 'Единица'))
+        for row in rows:
+            yield writer.writerow(
+                (
+                    row['ingredient__name'],
+                    row['ingredient_total'],
+                    row['ingredient__measurement_unit'],
+                )
+            )
+
+
+class PdfRenderer:
+    """PDF-версия списка покупок.
+
+    Формат PDF требует таблицу смещений в конце файла, поэтому документ
+    собирается целиком и отдаётся одним блоком.
+    """
+
+    content_type = 'application/pdf'
+    extension = 'pdf'
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    line_height = 18
+    margin = 50
+
+    def render(self, rows):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.pdfgen import canvas
+
+        pdfmetrics.registerFont(
+            TTFont(self.font_name, settings.SHOPPING_LIST_FONT)
+        )
+        buffer = io.BytesIO()
+        page = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        page.setFont(self.font_name, self.font_size + 4)
+        page.drawString(self.margin, height - self.margin, TITLE)
+        page.setFont(self.font_name, self.font_size)
+        y = height - self.margin - 2 * self.line_height
+        for row in rows:
+            if y < self.margin:
+                page.showPage()
+                page.setFont(self.font_name, self.font_size)
+                y = height - self.margin
+            page.drawString(
+                self.margin,
+                y,
+                f'{row["ingredient__name"]} - {row["ingredient_total"]} '
+                f'({row["ingredient__measurement_unit"]})',
+            )
+            y -= self.line_height
+        page.save()
+        yield buffer.getvalue()
+
+
+RENDERERS = {
+    renderer.extension: renderer
+    for renderer in (TxtRenderer, CsvRenderer, PdfRenderer)
+}
+
+
+def shopping_list_response(rows, file_type):
+    renderer = RENDERERS[file_type]()
+    response = StreamingHttpResponse(
+        renderer.render(rows), content_type=renderer.content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{FILENAME}.{renderer.extension}"'
+    )
+    return response
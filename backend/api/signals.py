@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.caching import bump_model_version
+from api.metrics import install_execute_wrapper
+from recipes.models import Ingredient, Tag
+
+connection_created.connect(install_execute_wrapper)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def bump_reference_version(sender, **kwargs):
+    bump_model_version(sender)
+
+
+@receiver(request_started)
+def close_unusable_connections(**kwargs):
+    """Закрывает постоянные соединения, которые перестали работать.
+
+    Проверка выполняется в начале запроса только для открытых
+    соединений, поэтому после перезапуска базы или pgbouncer запрос
+    откроет новое соединение вместо ошибки на старом.
+    """
+    if not settings.DB_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
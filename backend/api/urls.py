@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from .async_views import wrap_async_read_views
 from .views import IngredientsViewSet, RecipesViewSet, TagViewSet, UsersViewSet
 
 app_name = 'api'
@@ -11,8 +13,12 @@ router.register('tags', TagViewSet, basename='tags')
 router.register('recipes', RecipesViewSet, basename='recipes')
 router.register('ingredients', IngredientsViewSet, basename='ingredients')
 
+router_urls = router.urls
+if settings.ASYNC_READ_VIEWS:
+    router_urls = wrap_async_read_views(router_urls)
+
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,35 +1,101 @@
-from django.db.models import Exists, OuterRef, Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Subquery, Value
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import status, viewsets
+from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.validators import ValidationError
 
+from api.caching import CachedResponseMixin, get_model_version
 from api.filters import IngredientFilter, RecipeFilter
+from api.metrics import QueryBudgetMixin
+from api.pagination import (CustomPagination, FeedPagination,
+                            RecipeCursorPagination)
 from api.permissions import IsOwnerOrReadOnly
+from api.representations import recipe_representation
 from api.serializers import (FavoriteRecipeSerializer, FollowSerializer,
-                             IngredientSerializer, RecipesCreateSerializer,
-                             RecipesListSerializer, TagSerializer,
-                             UserSerializer)
-from recipes.models import (FavoriteRecipe, Follow, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag)
+                             IngredientSerializer, RecipeMatchSerializer,
+                             RecipesCreateSerializer, RecipesListSerializer,
+                             TagSerializer, UserSerializer)
+from api.shopping_list import (RENDERERS, get_shopping_list,
+                               shopping_list_response)
+from recipes.deletion import delete_recipes
+from recipes.feed import fan_out, follow_author, unfollow_author
+from recipes.ingredient_index import ingredient_index
+from recipes.matching import recipe_matcher
+from recipes.models import (FavoriteRecipe, Follow, Ingredient,
+                            IngredientPosting, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.ranking import record_activity
+from recipes.search import search_recipes
+from recipes.shopping_list import refresh_cart
 from users.models import User
 
+RECIPES_LIMIT = 3
+RECIPE_COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    ShoppingCart: 'carts_count',
+}
 
-class UsersViewSet(UserViewSet):
-    queryset = User.objects.all()
+
+class UsersViewSet(QueryBudgetMixin, UserViewSet):
+    queryset = User.objects.order_by('id')
     serializer_class = UserSerializer
+    query_budget = {'list': 3, 'retrieve': 3, 'me': 3, 'subscriptions': 4}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Follow.objects.filter(
+                        user=self.request.user, author=OuterRef('id')
+                    )
+                )
+            )
+        return queryset
+
+    def get_authors_queryset(self, queryset):
+        """Авторы с числом рецептов и последними рецептами.
+
+        Последние рецепты каждого автора выбираются одним запросом
+        на всю страницу, их количество задаёт параметр recipes_limit.
+        Число рецептов берётся из счётчика User.recipes_count.
+        """
+        try:
+            recipes_limit = int(
+                self.request.query_params.get(
+                    'recipes_limit', RECIPES_LIMIT
+                )
+            )
+        except ValueError:
+            recipes_limit = RECIPES_LIMIT
+        latest_recipes = Recipe.objects.filter(
+            id__in=Subquery(
+                Recipe.objects.filter(author=OuterRef('author'))
+                .order_by('-pub_date')
+                .values('id')[:max(recipes_limit, 0)]
+            )
+        )
+        return queryset.prefetch_related(
+            Prefetch(
+                'recipes', queryset=latest_recipes, to_attr='latest_recipes'
+            )
+        )
 
     @action(
         methods=['GET'], detail=False, permission_classes=(IsAuthenticated,)
     )
     def subscriptions(self, request):
-        user = request.user
-        queryset = Follow.objects.filter(user=user)
+        queryset = self.get_authors_queryset(
+            User.objects.filter(following__user=request.user)
+            .annotate(is_subscribed=Value(True))
+            .order_by('id')
+        )
         page = self.paginate_queryset(queryset)
         serializer = FollowSerializer(
             page, many=True, context={'request': request}
@@ -48,8 +114,22 @@ class UsersViewSet(UserViewSet):
                     {'errors': 'Вы не можете подписаться на себя'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+            if Follow.objects.filter(
+                user=request.user, author=author
+            ).exists():
+                return Response(
+                    {'errors': 'Вы уже подписаны на этого автора'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            with transaction.atomic():
+                Follow.objects.create(user=request.user, author=author)
+                follow_author(request.user, author)
             serializer = FollowSerializer(
-                Follow.objects.create(user=request.user, author=author),
+                self.get_authors_queryset(
+                    User.objects.filter(id=author.id).annotate(
+                        is_subscribed=Value(True)
+                    )
+                ).get(),
                 context={'request': request},
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -57,9 +137,11 @@ class UsersViewSet(UserViewSet):
             if Follow.objects.filter(
                 user=request.user, author=author
             ).exists():
-                Follow.objects.filter(
-                    user=request.user, author=author
-                ).delete()
+                with transaction.atomic():
+                    Follow.objects.filter(
+                        user=request.user, author=author
+                    ).delete()
+                    unfollow_author(request.user, author)
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response(
                 {'errors': 'Нет такой подписки!'},
@@ -67,24 +149,50 @@ class UsersViewSet(UserViewSet):
             )
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(
+    QueryBudgetMixin, CachedResponseMixin, viewsets.ModelViewSet
+):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    query_budget = {'list': 3, 'retrieve': 3}
 
 
-class IngredientsViewSet(viewsets.ModelViewSet):
+class IngredientsViewSet(
+    QueryBudgetMixin, CachedResponseMixin, viewsets.ModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_class = IngredientFilter
+    filterset_class = IngredientFilter
+    query_budget = {'list': 3, 'retrieve': 3}
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name and settings.INGREDIENT_SEARCH_INDEX:
+            return self.cached_response(request, self.search, name)
+        return super().list(request, *args, **kwargs)
+
+    def search(self, request, name):
+        return Response(
+            ingredient_index.search(name, get_model_version(Ingredient))
+        )
 
 
-class RecipesViewSet(viewsets.ModelViewSet):
+class RecipesViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
-    filter_class = RecipeFilter
+    filterset_class = RecipeFilter
     permission_classes = (IsOwnerOrReadOnly,)
+    pagination_class = RecipeCursorPagination
+    query_budget = {
+        'list': 5,
+        'retrieve': 3,
+        'search': 4,
+        'feed': 6,
+        'match': 5,
+        'similar': 3,
+    }
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
@@ -93,11 +201,11 @@ class RecipesViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         query = Recipe.objects.select_related('author').prefetch_related(
-            'tags',
-            'ingredients',
-            'recipe',
-            'shopping_cart_recipe',
-            'favorite_recipe',
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'recipe',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            ),
         )
         if self.request.user.is_authenticated:
             query = query.annotate(
@@ -111,11 +219,54 @@ class RecipesViewSet(viewsets.ModelViewSet):
                         user=self.request.user, recipe=OuterRef('id')
                     )
                 ),
+                author_is_subscribed=Exists(
+                    Follow.objects.filter(
+                        user=self.request.user, author=OuterRef('author')
+                    )
+                ),
             )
         return query
 
+    def render_rows(self, rows):
+        """Быстрое представление строк values() с учётом времени."""
+        return self.time_serialization(recipe_representation.render)(
+            rows, self.request
+        )
+
+    def paginated_response(self, queryset):
+        if not settings.RECIPES_FAST_REPRESENTATION:
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        rows = recipe_representation.values(queryset.prefetch_related(None))
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(self.render_rows(page))
+
+    def list(self, request, *args, **kwargs):
+        return self.paginated_response(
+            self.filter_queryset(self.get_queryset())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.RECIPES_FAST_REPRESENTATION:
+            return super().retrieve(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        row = generics.get_object_or_404(
+            recipe_representation.values(queryset.prefetch_related(None)),
+            pk=kwargs['pk'],
+        )
+        return Response(self.render_rows([row])[0])
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        fan_out(recipe)
+        User.objects.filter(pk=self.request.user.pk).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+    def perform_destroy(self, instance):
+        delete_recipes([instance])
 
     @action(
         detail=True,
@@ -139,48 +290,112 @@ class RecipesViewSet(viewsets.ModelViewSet):
         else:
             return self.delete_recipe(ShoppingCart, request, pk)
 
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        return self.paginated_response(self.get_queryset())
+
+    @action(detail=False, pagination_class=CustomPagination)
+    def match(self, request):
+        params = RecipeMatchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        version = get_model_version(IngredientPosting)
+        if params.validated_data['mode'] == 'all':
+            ids = recipe_matcher.contains_all(
+                params.validated_data['ingredients'], version
+            )
+        else:
+            ids = recipe_matcher.missing_at_most(
+                params.validated_data['ingredients'],
+                params.validated_data['missing'],
+                version,
+            )
+        page = [int(pk) for pk in self.paginate_queryset(ids)]
+        queryset = self.get_queryset().filter(id__in=page)
+        if settings.RECIPES_FAST_REPRESENTATION:
+            rows = {
+                row['id']: row
+                for row in recipe_representation.values(
+                    queryset.prefetch_related(None)
+                )
+            }
+            data = self.render_rows([rows[pk] for pk in page if pk in rows])
+        else:
+            recipes = {recipe.id: recipe for recipe in queryset}
+            data = self.get_serializer(
+                [recipes[pk] for pk in page if pk in recipes], many=True
+            ).data
+        return self.get_paginated_response(data)
+
+    @action(detail=True, pagination_class=None)
+    def similar(self, request, pk):
+        queryset = self.get_queryset().filter(similar_to__recipe_id=pk)
+        queryset = queryset.order_by('-similar_to__score', '-id')
+        if settings.RECIPES_FAST_REPRESENTATION:
+            data = self.render_rows(
+                recipe_representation.values(queryset.prefetch_related(None))
+            )
+        else:
+            data = self.get_serializer(queryset, many=True).data
+        if not data:
+            get_object_or_404(Recipe, pk=pk)
+        return Response(data)
+
+    @action(methods=['GET'], detail=False)
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError('Укажите поисковый запрос в параметре q')
+        queryset = search_recipes(
+            self.filter_queryset(self.get_queryset()), query
+        )
+        paginator = CustomPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         methods=['GET'], detail=False, permission_classes=(IsAuthenticated,)
     )
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.select_related(
-            'recipe', 'ingredient'
-        )
-        ingredients = ingredients.filter(
-            recipe__shopping_cart_recipe__user=request.user
-        )
-        ingredients = ingredients.values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        )
-        ingredients = ingredients.annotate(ingredient_total=Sum('amount'))
-        ingredients = ingredients.order_by('ingredient__name')
-        shopping_list = 'Список покупок: \n'
-        for ingredient in ingredients:
-            shopping_list += (
-                f'{ingredient["ingredient__name"]} - '
-                f'{ingredient["ingredient_total"]} '
-                f'({ingredient["ingredient__measurement_unit"]}), \n'
+        file_type = request.query_params.get('type', 'txt')
+        if file_type not in RENDERERS:
+            raise ValidationError(
+                f'Доступные форматы: {", ".join(RENDERERS)}'
             )
-            response = HttpResponse(
-                shopping_list, content_type='text/plain; charset=utf8'
-            )
-            response[
-                'Content-Disposition'
-            ] = 'attachment; filename="shopping_list.txt"'
-        return response
+        return shopping_list_response(
+            get_shopping_list(request.user), file_type
+        )
 
+    @transaction.atomic
     def add_recipe(self, model, request, pk):
         recipe = get_object_or_404(Recipe, pk=pk)
         user = self.request.user
         if model.objects.filter(recipe=recipe, user=user).exists():
             raise ValidationError('Рецепт уже добавлен')
-        model.objects.create(recipe=recipe, user=user)
+        item = model.objects.create(recipe=recipe, user=user)
+        record_activity(item)
+        counter = RECIPE_COUNTERS[model]
+        Recipe.objects.filter(pk=recipe.pk).update(**{counter: F(counter) + 1})
+        if model is ShoppingCart:
+            refresh_cart(user, recipe)
         serializer = FavoriteRecipeSerializer(recipe)
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete_recipe(self, model, request, pk):
         recipe = get_object_or_404(Recipe, pk=pk)
         user = self.request.user
         obj = get_object_or_404(model, recipe=recipe, user=user)
         obj.delete()
+        record_activity(obj, removed=True)
+        counter = RECIPE_COUNTERS[model]
+        Recipe.objects.filter(pk=recipe.pk, **{f'{counter}__gt': 0}).update(
+            **{counter: F(counter) - 1}
+        )
+        if model is ShoppingCart:
+            refresh_cart(user, recipe)
         return Response(status=status.HTTP_204_NO_CONTENT)
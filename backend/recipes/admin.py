@@ -1,6 +1,11 @@
 from django.contrib import admin
 
+from .deletion import delete_recipes
+from .matching import update_postings
 from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .search import update_search_vectors
+from .shopping_list import get_recipe_ingredients, refresh_recipe
+from .similarity import mark_stale
 
 
 @admin.register(Ingredient)
@@ -36,6 +41,7 @@ class RecipeAdmin(admin.ModelAdmin):
         'author',
         'cooking_time',
         'pub_date',
+        'get_favorite_count',
     )
     list_filter = (
         'name',
@@ -44,6 +50,36 @@ class RecipeAdmin(admin.ModelAdmin):
     )
     empty_value_display = '-пусто-'
 
-    @admin.display(description='В избранном')
+    def save_model(self, request, obj, form, change):
+        """Сохраняет только изменённые в форме поля рецепта.
+
+        Счётчики и оценки меняются запросами update() в обход формы,
+        полное сохранение записало бы поверх них прочитанные значения.
+        """
+        if not change:
+            return super().save_model(request, obj, form, change)
+        obj.save(
+            update_fields=[
+                field.name for field in obj._meta.concrete_fields
+                if field.name in form.changed_data
+            ]
+        )
+
+    def delete_model(self, request, obj):
+        delete_recipes([obj])
+
+    def delete_queryset(self, request, queryset):
+        delete_recipes(queryset.only('id', 'author_id'))
+
+    def save_related(self, request, form, formsets, change):
+        old = set(get_recipe_ingredients(form.instance))
+        super().save_related(request, form, formsets, change)
+        new = set(get_recipe_ingredients(form.instance))
+        update_postings(form.instance.pk, added=new - old, removed=old - new)
+        refresh_recipe(form.instance, old | new)
+        update_search_vectors([form.instance.pk])
+        mark_stale([form.instance.pk])
+
+    @admin.display(description='В избранном', ordering='favorites_count')
     def get_favorite_count(self, obj):
-        return obj.favorite_recipe.count()
+        return obj.favorites_count
@@ -0,0 +1,47 @@
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+
+from .matching import update_postings
+from .models import Recipe, RecipeIngredient, ShoppingCart
+from .shopping_list import refresh_totals
+from .similarity import mark_neighbours_stale
+
+User = get_user_model()
+
+
+@transaction.atomic
+def delete_recipes(recipes):
+    """Удаляет рецепты вместе с данными, которые от них зависят.
+
+    Общий путь для API и админки: рецепты убираются из списков по
+    ингредиентам, рецепты с ними среди похожих ставятся в очередь,
+    уменьшаются счётчики авторов и пересчитываются списки покупок.
+    """
+    recipes = list(recipes)
+    ids = [recipe.pk for recipe in recipes]
+    if not ids:
+        return
+    buyers = set(
+        ShoppingCart.objects.filter(recipe_id__in=ids).values_list(
+            'user_id', flat=True
+        )
+    )
+    ingredients = defaultdict(set)
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+        recipe_id__in=ids
+    ).values_list('recipe_id', 'ingredient_id'):
+        ingredients[recipe_id].add(ingredient_id)
+    for recipe_id, removed in sorted(ingredients.items()):
+        update_postings(recipe_id, removed=removed)
+    mark_neighbours_stale(ids)
+    Recipe.objects.filter(pk__in=ids).delete()
+    for author, count in Counter(
+        recipe.author_id for recipe in recipes
+    ).items():
+        User.objects.filter(pk=author, recipes_count__gte=count).update(
+            recipes_count=F('recipes_count') - count
+        )
+    refresh_totals(buyers, set().union(*ingredients.values()))
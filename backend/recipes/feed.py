@@ -0,0 +1,231 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+
+from .models import FeedItem, Follow, Recipe, User
+
+BATCH_SIZE = 1000
+
+MERGE_SQL = '''
+SELECT recipe.id
+FROM {follow} AS follow
+CROSS JOIN LATERAL (
+    SELECT id, pub_date
+    FROM {recipe}
+    WHERE author_id = follow.author_id {keyset}
+    ORDER BY pub_date DESC, id DESC
+    LIMIT %s
+) AS recipe
+WHERE follow.user_id = %s
+ORDER BY recipe.pub_date DESC, recipe.id DESC
+LIMIT %s
+'''
+MERGE_KEYSET = 'AND (pub_date, id) < (%s, %s)'
+COPY_AUTHOR_SQL = '''
+INSERT INTO {feed} (user_id, recipe_id, pub_date)
+SELECT %s, id, pub_date
+FROM {recipe}
+WHERE author_id = %s
+ON CONFLICT DO NOTHING
+'''
+COPY_FOLLOWED_SQL = '''
+INSERT INTO {feed} (user_id, recipe_id, pub_date)
+SELECT %s, id, pub_date
+FROM {recipe}
+WHERE author_id IN (SELECT author_id FROM {follow} WHERE user_id = %s)
+ON CONFLICT DO NOTHING
+'''
+
+
+def uses_inbox(user):
+    """Читается ли лента пользователя из заранее разложенных строк."""
+    threshold = settings.FEED_INBOX_MIN_FOLLOWS
+    return bool(threshold) and (
+        Follow.objects.filter(user=user).count() >= threshold
+    )
+
+
+def get_heavy_followers(author):
+    """Подписчики автора, для которых ведётся лента FeedItem."""
+    threshold = settings.FEED_INBOX_MIN_FOLLOWS
+    if not threshold:
+        return Follow.objects.none().values_list('user_id', flat=True)
+    follows_count = (
+        Follow.objects.filter(user=OuterRef('user'))
+        .order_by()
+        .values('user')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    return (
+        Follow.objects.filter(author=author)
+        .annotate(follows_count=Subquery(follows_count))
+        .filter(follows_count__gte=threshold)
+        .values_list('user_id', flat=True)
+    )
+
+
+def merge_feed_ids(user, position, limit):
+    """Слияние упорядоченных потоков рецептов каждого автора.
+
+    Для каждой подписки берётся не больше limit рецептов автора после
+    курсора по индексу (author, -pub_date), из этих потоков выбираются
+    первые limit. Объём работы зависит от числа подписок и размера
+    страницы, но не от общего числа рецептов авторов.
+    """
+    keyset = MERGE_KEYSET if position else ''
+    sql = MERGE_SQL.format(
+        follow=Follow._meta.db_table,
+        recipe=Recipe._meta.db_table,
+        keyset=keyset,
+    )
+    params = [limit, user.id, limit]
+    if position:
+        params = [*position, *params]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def get_feed_ids(user, position, limit):
+    """Id рецептов ленты после позиции (pub_date, id) по убыванию."""
+    if uses_inbox(user):
+        items = FeedItem.objects.filter(user=user)
+        if position:
+            pub_date, pk = position
+            items = items.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, recipe_id__lt=pk)
+            )
+        items = items.order_by('-pub_date', '-recipe_id')
+        return list(items.values_list('recipe_id', flat=True)[:limit])
+    if connection.vendor == 'postgresql':
+        return merge_feed_ids(user, position, limit)
+    recipes = Recipe.objects.filter(author__following__user=user)
+    if position:
+        pub_date, pk = position
+        recipes = recipes.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+        )
+    recipes = recipes.order_by('-pub_date', '-id')
+    return list(recipes.values_list('id', flat=True)[:limit])
+
+
+def get_feed_count(user):
+    return (
+        User.objects.filter(following__user=user).aggregate(
+            count=Sum('recipes_count')
+        )['count']
+        or 0
+    )
+
+
+def add_feed_items(users, recipes):
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user, recipe_id=recipe, pub_date=pub_date)
+            for user in users
+            for recipe, pub_date in recipes
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def copy_recipes(sql, params):
+    """Копирует рецепты в ленту одним INSERT ... SELECT."""
+    sql = sql.format(
+        feed=FeedItem._meta.db_table,
+        recipe=Recipe._meta.db_table,
+        follow=Follow._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def lock_user(user):
+    """Блокирует строку пользователя до конца транзакции.
+
+    Подписки одного пользователя меняют его ленту по очереди, и каждая
+    видит подписки, уже зафиксированные остальными.
+    """
+    list(User.objects.select_for_update().filter(pk=user.pk).values('pk'))
+
+
+def follow_author(user, author):
+    """Обновляет ленту после подписки user на author.
+
+    Вызывается в транзакции, уже добавившей подписку. Если строк ленты
+    ещё нет, она собирается по всем подпискам, иначе дописываются только
+    рецепты author. Оба запроса пропускают уже разложенные рецепты.
+    """
+    lock_user(user)
+    if not uses_inbox(user):
+        return
+    if FeedItem.objects.filter(user=user).exists():
+        copy_recipes(COPY_AUTHOR_SQL, [user.id, author.id])
+    else:
+        rebuild_inbox(user)
+
+
+def unfollow_author(user, author):
+    """Обновляет ленту после отписки user от author."""
+    lock_user(user)
+    if uses_inbox(user):
+        FeedItem.objects.filter(user=user, recipe__author=author).delete()
+    else:
+        FeedItem.objects.filter(user=user).delete()
+
+
+def fan_out(recipe):
+    """Раскладывает новый рецепт в ленты подписчиков автора."""
+    add_feed_items(
+        list(get_heavy_followers(recipe.author_id)),
+        [(recipe.id, recipe.pub_date)],
+    )
+
+
+def rebuild_inbox(user):
+    FeedItem.objects.filter(user=user).delete()
+    copy_recipes(COPY_FOLLOWED_SQL, [user.id, user.id])
+
+
+def get_inbox_users():
+    threshold = settings.FEED_INBOX_MIN_FOLLOWS
+    if not threshold:
+        return User.objects.none()
+    return User.objects.annotate(follows_count=Count('follower')).filter(
+        follows_count__gte=threshold
+    )
+
+
+def rebuild_inboxes():
+    """Пересобирает все ленты FeedItem по подпискам и рецептам."""
+    users = get_inbox_users()
+    FeedItem.objects.exclude(user__in=users.values('id')).delete()
+    for user in users.iterator():
+        rebuild_inbox(user)
+
+
+def find_feed_drift():
+    """Пользователи, у которых строки ленты расходятся с подписками."""
+    drift = []
+    for user in get_inbox_users().iterator():
+        expected = set(
+            Recipe.objects.filter(author__following__user=user).values_list(
+                'id', flat=True
+            )
+        )
+        actual = set(
+            FeedItem.objects.filter(user=user).values_list(
+                'recipe_id', flat=True
+            )
+        )
+        if expected != actual:
+            drift.append(user.id)
+    extra = (
+        FeedItem.objects.exclude(user__in=get_inbox_users().values('id'))
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    return drift + list(extra)
@@ -0,0 +1,139 @@
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = (320, 640, 1280)
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+MAX_PIXELS = 4096 * 4096
+EXIF_ORIENTATION = 0x0112
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+RENDITIONS_DIR = 'renditions'
+
+
+def rendition_name(name, width, extension):
+    """Имя файла копии: recipes/renditions/<файл>-<ширина>.<формат>.
+
+    Имя оригинала берётся вместе с расширением, чтобы копии pie.jpg и
+    pie.png не совпадали.
+    """
+    directory, filename = os.path.split(name)
+    return os.path.join(
+        directory, RENDITIONS_DIR, f'{filename}-{width}.{extension}'
+    )
+
+
+def get_rendition_widths(width):
+    """Ширины копий для оригинала шириной width.
+
+    Берутся ширины из RENDITION_WIDTHS меньше оригинала; если какая-то
+    из них не меньше его, добавляется копия в ширину оригинала.
+    """
+    if not width:
+        return []
+    widths = [value for value in RENDITION_WIDTHS if value < width]
+    if len(widths) < len(RENDITION_WIDTHS):
+        widths.append(width)
+    return widths
+
+
+def get_renditions(name, width):
+    """Имена копий изображения шириной width: (ширина, формат, имя)."""
+    if not name:
+        return []
+    return [
+        (value, extension, rendition_name(name, value, extension))
+        for extension in RENDITION_FORMATS
+        for value in get_rendition_widths(width)
+    ]
+
+
+def open_image(field_file):
+    """Открывает изображение без метаданных, повёрнутым по EXIF.
+
+    Размер проверяется по заголовку до декодирования: изображения больше
+    MAX_PIXELS не обрабатываются. JPEG декодируется сразу в уменьшенном
+    масштабе, достаточном для самой широкой копии. Возвращает изображение
+    и ширину оригинала после поворота.
+    """
+    width = max(RENDITION_WIDTHS)
+    with field_file.open('rb') as file:
+        image = Image.open(file)
+        if image.width * image.height > MAX_PIXELS:
+            raise ValueError(
+                f'{image.width}x{image.height} больше {MAX_PIXELS} пикселей'
+            )
+        original_width = image.width
+        if image.getexif().get(EXIF_ORIENTATION) in ROTATED_ORIENTATIONS:
+            original_width = image.height
+        image.draft('RGB', (width, width))
+        image = ImageOps.exif_transpose(image)
+        return image.convert('RGB'), original_width
+
+
+def save_image(storage, name, image, extension):
+    image_format, options = RENDITION_FORMATS[extension]
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def delete_renditions(storage, name, width=None):
+    """Удаляет копии изображения name.
+
+    Если ширина оригинала неизвестна, проверяются копии стандартных
+    ширин.
+    """
+    widths = set(RENDITION_WIDTHS)
+    if width:
+        widths.add(width)
+    for value in sorted(widths):
+        for extension in RENDITION_FORMATS:
+            rendition = rendition_name(name, value, extension)
+            if storage.exists(rendition):
+                storage.delete(rendition)
+
+
+def create_renditions(field_file, width=None, replace=False):
+    """Создаёт уменьшенные копии изображения в WebP и JPEG.
+
+    Копии не шире оригинала, метаданные в них не переносятся.
+    Уже созданные копии пересоздаются только с replace; если известна
+    ширина оригинала и все копии на месте, изображение не открывается.
+    Возвращает ширину оригинала или None, если открыть его не удалось.
+    """
+    storage = field_file.storage
+    if not replace and width and all(
+        storage.exists(name)
+        for _, _, name in get_renditions(field_file.name, width)
+    ):
+        return width
+    try:
+        image, original = open_image(field_file)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        logger.warning(
+            'Не удалось обработать изображение %s: %s', field_file.name, error
+        )
+        return None
+    missing = [
+        rendition for rendition in get_renditions(field_file.name, original)
+        if replace or not storage.exists(rendition[2])
+    ]
+    for width, extension, name in missing:
+        rendition = image
+        if image.width > width:
+            rendition = image.resize(
+                (width, round(image.height * width / image.width)),
+                Image.Resampling.LANCZOS,
+            )
+        save_image(storage, name, rendition, extension)
+    return original
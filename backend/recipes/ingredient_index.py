@@ -0,0 +1,81 @@
+import bisect
+import threading
+import time
+
+from .models import Ingredient
+
+INDEX_TTL = 300
+
+
+def normalize(value):
+    return value.strip().lower().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Нормализованные названия хранятся в отсортированном списке, поэтому
+    поиск по префиксу - это бинарный поиск границ диапазона. Совпадения
+    по подстроке идут после совпадений по префиксу. Индекс строится
+    одним запросом и сбрасывается при изменении ингредиентов, смене
+    переданной версии данных или по истечении INDEX_TTL секунд.
+    """
+
+    def __init__(self, ttl=INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._keys = None
+        self._items = None
+        self._version = None
+        self._built_at = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+            self._items = None
+
+    def _build(self):
+        rows = sorted(
+            (
+                (normalize(name), pk, name, measurement_unit)
+                for pk, name, measurement_unit in (
+                    Ingredient.objects.values_list(
+                        'id', 'name', 'measurement_unit'
+                    ).iterator()
+                )
+            ),
+            key=lambda row: (row[0], row[1]),
+        )
+        keys = [row[0] for row in rows]
+        items = [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in rows
+        ]
+        return keys, items
+
+    def _get(self, version):
+        with self._lock:
+            expired = time.monotonic() - self._built_at > self.ttl
+            if self._keys is None or expired or version != self._version:
+                self._keys, self._items = self._build()
+                self._version = version
+                self._built_at = time.monotonic()
+            return self._keys, self._items
+
+    def search(self, query, version=None):
+        query = normalize(query)
+        keys, items = self._get(version)
+        if not query:
+            return list(items)
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_left(keys, query + '\uffff', lo=start)
+        prefix = items[start:end]
+        contains = [
+            items[position]
+            for position, key in enumerate(keys)
+            if query in key and not start <= position < end
+        ]
+        return prefix + contains
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from django.db import transaction
+
+BATCH_SIZE = 1000
+
+
+def read_csv(path, fieldnames):
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile, fieldnames=fieldnames):
+            yield {field: row[field].strip() for field in fieldnames}
+
+
+def read_json(path, fieldnames):
+    with open(path, encoding='utf-8') as jsonfile:
+        for row in json.load(jsonfile):
+            yield {field: row[field].strip() for field in fieldnames}
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def read_rows(path, fieldnames):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f'Неподдерживаемый формат файла: {extension}')
+    return READERS[extension](path, fieldnames)
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BulkLoader:
+    """Идемпотентная пакетная загрузка справочников.
+
+    Строки сопоставляются с существующими записями по key_fields, которые
+    читаются из базы одним запросом. Новые записи создаются bulk_create,
+    изменившиеся поля update_fields обновляются bulk_update, повторы и
+    строки без изменений пропускаются.
+    """
+
+    def __init__(self, model, key_fields, update_fields=(),
+                 batch_size=BATCH_SIZE):
+        self.model = model
+        self.key_fields = tuple(key_fields)
+        self.update_fields = tuple(update_fields)
+        self.batch_size = batch_size
+
+    def get_key(self, row):
+        return tuple(row[field] for field in self.key_fields)
+
+    def load(self, rows):
+        fields = ('pk',) + self.key_fields + self.update_fields
+        existing = {}
+        for values in self.model.objects.values_list(*fields).iterator():
+            record = dict(zip(fields, values))
+            existing[self.get_key(record)] = record
+        seen = set()
+        stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        with transaction.atomic():
+            for chunk in chunked(rows, self.batch_size):
+                to_create, to_update = [], []
+                for row in chunk:
+                    key = self.get_key(row)
+                    if key in seen:
+                        stats['skipped'] += 1
+                        continue
+                    seen.add(key)
+                    record = existing.get(key)
+                    if record is None:
+                        to_create.append(self.model(**row))
+                    elif any(
+                        record[field] != row[field]
+                        for field in self.update_fields
+                    ):
+                        to_update.append(self.model(pk=record['pk'], **row))
+                    else:
+                        stats['skipped'] += 1
+                self.model.objects.bulk_create(to_create)
+                if to_update:
+                    self.model.objects.bulk_update(
+                        to_update, self.update_fields
+                    )
+                stats['inserted'] += len(to_create)
+                stats['updated'] += len(to_update)
+        return stats
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.signals import update_image_renditions
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие уменьшенные копии изображений рецептов.'
+
+    def handle(self, *args, **options):
+        processed = 0
+        for recipe in Recipe.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).only('id', 'image', 'image_width').iterator():
+            update_image_renditions(recipe)
+            processed += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано рецептов: {processed}')
+        )
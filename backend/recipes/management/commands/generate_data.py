@@ -0,0 +1,158 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+
+from recipes.models import (FavoriteRecipe, Follow, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from users.models import User
+
+WORDS = (
+    'суп', 'салат', 'пирог', 'запеканка', 'рагу', 'омлет', 'каша',
+    'котлеты', 'блины', 'паста', 'плов', 'борщ', 'десерт', 'соус',
+    'домашний', 'быстрый', 'сырный', 'овощной', 'куриный', 'грибной',
+)
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетические данные для нагрузочных замеров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=100000)
+        parser.add_argument('--carts', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def batches(self, total, make):
+        batch_size = self.batch_size
+        for start in range(0, total, batch_size):
+            end = min(start + batch_size, total)
+            yield [make(index) for index in range(start, end)]
+
+    def write(self, model, total, make, **kwargs):
+        for number, batch in enumerate(self.batches(total, make), 1):
+            model.objects.bulk_create(
+                batch, batch_size=self.batch_size, **kwargs
+            )
+            done = min(number * self.batch_size, total)
+            self.stdout.write(
+                f'\r{model._meta.verbose_name_plural}: {done}/{total}',
+                ending='',
+            )
+        self.stdout.write('')
+
+    def generate_users(self, total):
+        offset = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        password = make_password('benchmark')
+
+        def make(index):
+            number = offset + index
+            return User(
+                email=f'bench{number}@example.com',
+                username=f'bench{number}',
+                first_name='Тест',
+                last_name=f'Пользователь {number}',
+                password=password,
+            )
+
+        self.write(User, total, make)
+
+    def generate_recipes(self, total, users):
+        def make(index):
+            name = ' '.join(random.sample(WORDS, 3)).capitalize()
+            return Recipe(
+                author_id=random.choice(users),
+                name=name,
+                text=' '.join(random.choices(WORDS, k=30)),
+                cooking_time=random.randint(5, 180),
+                image='recipes/benchmark.jpg',
+            )
+
+        self.write(Recipe, total, make)
+
+    def generate_recipe_relations(self, recipes, per_recipe, ingredients,
+                                  tags):
+        pairs = (
+            (recipe, ingredient)
+            for recipe in recipes
+            for ingredient in random.sample(ingredients, per_recipe)
+        )
+
+        def make_ingredient(index):
+            recipe, ingredient = next(pairs)
+            return RecipeIngredient(
+                recipe_id=recipe,
+                ingredient_id=ingredient,
+                amount=random.randint(1, 500),
+            )
+
+        self.write(
+            RecipeIngredient, len(recipes) * per_recipe, make_ingredient
+        )
+        through = Recipe.tags.through
+        self.write(
+            through,
+            len(recipes),
+            lambda index: through(
+                recipe_id=recipes[index], tag_id=random.choice(tags)
+            ),
+        )
+
+    def generate_pairs(self, model, total, fields, left, right):
+        """Случайные пары, повторы отбрасывает ignore_conflicts."""
+        left_field, right_field = fields
+
+        def make(index):
+            return model(
+                **{
+                    left_field: random.choice(left),
+                    right_field: random.choice(right),
+                }
+            )
+
+        self.write(model, total, make, ignore_conflicts=True)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        tags = list(Tag.objects.values_list('id', flat=True))
+        if len(ingredients) < options['ingredients_per_recipe'] or not tags:
+            raise CommandError(
+                'Сначала загрузите ингредиенты и теги: '
+                'load_ingredients и load_tags'
+            )
+        self.generate_users(options['users'])
+        users = list(User.objects.values_list('id', flat=True))
+        start = Recipe.objects.aggregate(last=Max('id'))['last'] or 0
+        self.generate_recipes(options['recipes'], users)
+        recipes = list(
+            Recipe.objects.filter(id__gt=start).values_list('id', flat=True)
+        )
+        self.generate_recipe_relations(
+            recipes, options['ingredients_per_recipe'], ingredients, tags
+        )
+        recipes = list(Recipe.objects.values_list('id', flat=True))
+        user_recipe = ('user_id', 'recipe_id')
+        for model, total, fields, right in (
+            (FavoriteRecipe, options['favorites'], user_recipe, recipes),
+            (ShoppingCart, options['carts'], user_recipe, recipes),
+            (Follow, options['follows'], ('user_id', 'author_id'), users),
+        ):
+            self.generate_pairs(model, total, fields, users, right)
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_shopping_lists', stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        call_command('update_search_vectors', stdout=self.stdout)
+        call_command('rebuild_ingredient_postings', stdout=self.stdout)
+        call_command('update_recipe_scores', rebuild=True, stdout=self.stdout)
+        call_command(
+            'update_similar_recipes', rebuild=True, stdout=self.stdout
+        )
+        self.stdout.write(self.style.SUCCESS('Данные сгенерированы'))
@@ -1,25 +1,39 @@
-import csv
 import os
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
+from api.caching import bump_model_version
+from recipes.ingredient_index import ingredient_index
+from recipes.loaders import BulkLoader, read_rows
 from recipes.models import Ingredient
 
 
 class Command(BaseCommand):
-    def handle(self, *args, **options):
-        self.stdout.write('Loading Ingredients')
+    help = 'Загружает ингредиенты из CSV или JSON файла.'
 
-        file_path = os.path.join(
-            os.path.abspath(os.path.dirname('manage.py')),
-            'data/ingredients.csv',
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(settings.BASE_DIR, 'data/ingredients.csv'),
+            help='Путь к файлу .csv или .json.',
         )
 
-        with open(file_path, newline='') as csvfile:
-            reader = csv.DictReader(
-                csvfile, fieldnames=['name', 'measurement_unit']
+    def handle(self, *args, **options):
+        self.stdout.write('Loading Ingredients')
+        try:
+            rows = read_rows(options['path'], ['name', 'measurement_unit'])
+            stats = BulkLoader(
+                Ingredient, key_fields=('name', 'measurement_unit')
+            ).load(rows)
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(error)
+        bump_model_version(Ingredient)
+        ingredient_index.invalidate()
+        self.stdout.write(
+            self.style.SUCCESS(
+                'All Ingredients are loaded! '
+                'Добавлено: {inserted}, обновлено: {updated}, '
+                'пропущено: {skipped}'.format(**stats)
             )
-            for row in reader:
-                Ingredient.objects.update_or_create(**row)
-
-        self.stdout.write(self.style.SUCCESS('All Ingredients are loaded!'))
+        )
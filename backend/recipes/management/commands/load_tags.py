@@ -1,5 +1,7 @@
 from django.core.management import BaseCommand
 
+from api.caching import bump_model_version
+from recipes.loaders import BulkLoader
 from recipes.models import Tag
 
 tags = [
@@ -11,5 +13,13 @@ tags = [
 
 class Command(BaseCommand):
     def handle(self, *args, **kwargs):
-        Tag.objects.bulk_create(Tag(**tag) for tag in tags)
-        self.stdout.write(self.style.SUCCESS('Теги загружены!'))
+        stats = BulkLoader(
+            Tag, key_fields=('slug',), update_fields=('name', 'color')
+        ).load(tags)
+        bump_model_version(Tag)
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Теги загружены! Добавлено: {inserted}, '
+                'обновлено: {updated}, пропущено: {skipped}'.format(**stats)
+            )
+        )
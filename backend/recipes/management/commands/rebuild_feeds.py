@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.feed import find_feed_drift, rebuild_inboxes
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает или проверяет разложенные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = find_feed_drift()
+            if drift:
+                self.stdout.write(f'user={drift[:20]}')
+                raise CommandError(f'Найдено расхождений: {len(drift)}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        with transaction.atomic():
+            rebuild_inboxes()
+        self.stdout.write(self.style.SUCCESS('Ленты подписок пересобраны'))
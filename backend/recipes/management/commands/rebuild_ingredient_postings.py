@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.caching import bump_model_version
+from recipes.matching import find_posting_drift, rebuild_postings
+from recipes.models import IngredientPosting
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает или проверяет списки рецептов по ингредиентам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = find_posting_drift()
+            if drift:
+                self.stdout.write(f'ingredient={drift[:20]}')
+                raise CommandError(f'Найдено расхождений: {len(drift)}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        with transaction.atomic():
+            updated = rebuild_postings()
+        bump_model_version(IngredientPosting)
+        self.stdout.write(
+            self.style.SUCCESS(f'Списки рецептов пересобраны: {updated}')
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.shopping_list import find_drift, rebuild_totals
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает или проверяет итоги списков покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = find_drift()
+            if drift:
+                for user, ingredient in drift[:20]:
+                    self.stdout.write(
+                        f'user={user} ingredient={ingredient}'
+                    )
+                raise CommandError(f'Найдено расхождений: {len(drift)}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        with transaction.atomic():
+            rebuild_totals()
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересобраны'))
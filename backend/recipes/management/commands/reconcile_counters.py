@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import User
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Сверяет и исправляет счётчики избранного, корзин и рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать количество расхождений.',
+        )
+
+    def handle(self, *args, **options):
+        counters = (
+            (
+                Recipe.objects.all(),
+                {
+                    'favorites_count': count_subquery(
+                        FavoriteRecipe.objects.all(), 'recipe'
+                    ),
+                    'carts_count': count_subquery(
+                        ShoppingCart.objects.all(), 'recipe'
+                    ),
+                },
+            ),
+            (
+                User.objects.all(),
+                {
+                    'recipes_count': count_subquery(
+                        Recipe.objects.all(), 'author'
+                    ),
+                },
+            ),
+        )
+        with transaction.atomic():
+            for queryset, expressions in counters:
+                actual = {
+                    f'actual_{field}': expression
+                    for field, expression in expressions.items()
+                }
+                drift = Q()
+                for field in expressions:
+                    drift |= ~Q(**{field: F(f'actual_{field}')})
+                stale = queryset.alias(**actual).filter(drift)
+                name = queryset.model._meta.verbose_name_plural
+                if options['check']:
+                    self.stdout.write(f'{name}: {stale.count()} расхождений')
+                    continue
+                updated = queryset.filter(
+                    pk__in=stale.values('pk')
+                ).update(**expressions)
+                self.stdout.write(f'{name}: исправлено {updated}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
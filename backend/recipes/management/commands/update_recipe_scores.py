@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from recipes.models import RecipeActivity
+from recipes.ranking import find_score_drift, rebuild_scores, update_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет оценки популярности и тренда рецептов по действиям, '
+        'накопленным с прошлого запуска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Пересчитать оценки всех рецептов заново.',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, ничего не меняя.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять обновление каждые N секунд.',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            pending = RecipeActivity.objects.count()
+            self.stdout.write(f'Необработанных действий: {pending}')
+            drift = find_score_drift()
+            if drift:
+                self.stdout.write(f'recipe={drift[:20]}')
+                raise CommandError(f'Найдено расхождений: {len(drift)}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        if options['rebuild']:
+            updated = rebuild_scores()
+            self.stdout.write(
+                self.style.SUCCESS(f'Пересчитано рецептов: {updated}')
+            )
+            return
+        while True:
+            close_old_connections()
+            processed = update_scores()
+            self.stdout.write(f'Обработано действий: {processed}')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import is_full_text_available, update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковые векторы всех рецептов.'
+
+    def handle(self, *args, **options):
+        if not is_full_text_available():
+            self.stdout.write('Полнотекстовый поиск требует PostgreSQL')
+            return
+        updated = update_search_vectors()
+        self.stdout.write(
+            self.style.SUCCESS(f'Обновлено рецептов: {updated}')
+        )
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from recipes.models import SimilarityUpdate
+from recipes.similarity import (find_similar_drift, rebuild_similar,
+                                update_similar)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты для рецептов, изменённых с '
+        'прошлого запуска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Пересчитать похожие для всех рецептов заново.',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, ничего не меняя.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять обновление каждые N секунд.',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            pending = SimilarityUpdate.objects.count()
+            self.stdout.write(f'Рецептов в очереди: {pending}')
+            drift = find_similar_drift()
+            if drift:
+                self.stdout.write(f'recipe={drift[:20]}')
+                raise CommandError(f'Найдено расхождений: {len(drift)}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        if options['rebuild']:
+            updated = rebuild_similar()
+            self.stdout.write(
+                self.style.SUCCESS(f'Пересчитано рецептов: {updated}')
+            )
+            return
+        while True:
+            close_old_connections()
+            stale, saved = update_similar()
+            self.stdout.write(
+                f'Рецептов в очереди: {stale}, обновлено списков: {saved}'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
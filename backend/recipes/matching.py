@@ -0,0 +1,270 @@
+import itertools
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import IngredientPosting, RecipeIngredient
+
+INDEX_TTL = 300
+REFRESH_INTERVAL = 5
+REFRESH_OVERLAP = 60
+BATCH_SIZE = 100
+BLOCK_SIZE = 4096
+POSTING_DTYPE = np.dtype('<i4')
+
+
+def load_posting(data):
+    return np.frombuffer(data, dtype=POSTING_DTYPE)
+
+
+def dump_posting(recipes):
+    return np.asarray(recipes, dtype=POSTING_DTYPE).tobytes()
+
+
+def split_blocks(recipes):
+    """Делит отсортированные id рецептов на блоки по BLOCK_SIZE id."""
+    blocks, starts = np.unique(recipes // BLOCK_SIZE, return_index=True)
+    return zip(blocks.tolist(), np.split(recipes, starts[1:]))
+
+
+def update_postings(recipe_id, added=(), removed=()):
+    """Добавляет рецепт в списки ингредиентов added и убирает из removed.
+
+    Вызывается в транзакции, которая меняет состав рецепта. Меняются
+    только блоки с id рецепта, поэтому рецепты из разных блоков не ждут
+    друг друга. Строки блокируются в порядке id ингредиента, так что
+    параллельные изменения рецептов с общими ингредиентами не
+    взаимоблокируются. После фиксации индекс этого процесса дочитает
+    изменённые блоки при следующем запросе.
+    """
+    added, removed = set(added), set(removed) - set(added)
+    if not added and not removed:
+        return
+    block = recipe_id // BLOCK_SIZE
+    IngredientPosting.objects.bulk_create(
+        [
+            IngredientPosting(ingredient_id=pk, block=block)
+            for pk in sorted(added)
+        ],
+        ignore_conflicts=True,
+    )
+    postings = (
+        IngredientPosting.objects.select_for_update()
+        .filter(ingredient__in=added | removed, block=block)
+        .order_by('ingredient')
+    )
+    for posting in postings:
+        recipes = load_posting(posting.recipes)
+        position = int(np.searchsorted(recipes, recipe_id))
+        present = position < len(recipes) and recipes[position] == recipe_id
+        if posting.ingredient_id in added and not present:
+            recipes = np.insert(recipes, position, recipe_id)
+        elif posting.ingredient_id in removed and present:
+            recipes = np.delete(recipes, position)
+        else:
+            continue
+        posting.recipes = dump_posting(recipes)
+        posting.save(update_fields=['recipes', 'updated'])
+    transaction.on_commit(recipe_matcher.expire)
+
+
+def calculate_postings():
+    """Списки рецептов ингредиентов, построенные по RecipeIngredient."""
+    pairs = np.fromiter(
+        itertools.chain.from_iterable(
+            RecipeIngredient.objects.order_by()
+            .values_list('ingredient_id', 'recipe_id')
+            .iterator()
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+    ingredients, starts = np.unique(pairs[:, 0], return_index=True)
+    return dict(
+        zip(ingredients.tolist(), np.split(pairs[:, 1], starts[1:]))
+    )
+
+
+def load_postings(queryset):
+    """Блоки из queryset: ингредиент - {блок: id рецептов}."""
+    blocks = defaultdict(dict)
+    for pk, block, data in queryset.values_list(
+        'ingredient_id', 'block', 'recipes'
+    ).iterator():
+        blocks[pk][block] = load_posting(data)
+    return blocks
+
+
+def join_blocks(blocks):
+    return np.concatenate(
+        [blocks[block] for block in sorted(blocks)]
+        or [np.empty(0, dtype=POSTING_DTYPE)]
+    )
+
+
+def rebuild_postings():
+    """Перестраивает все списки рецептов, возвращает число ингредиентов."""
+    postings = calculate_postings()
+    IngredientPosting.objects.all().delete()
+    IngredientPosting.objects.bulk_create(
+        (
+            IngredientPosting(
+                ingredient_id=pk, block=block, recipes=dump_posting(part)
+            )
+            for pk, recipes in postings.items()
+            for block, part in split_blocks(recipes)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    return len(postings)
+
+
+def find_posting_drift():
+    """Id ингредиентов, чьи списки расходятся с RecipeIngredient."""
+    expected = calculate_postings()
+    drift = set()
+    for pk, blocks in load_postings(IngredientPosting.objects.all()).items():
+        recipes = expected.pop(pk, np.empty(0, dtype=np.int64))
+        if not np.array_equal(join_blocks(blocks), recipes):
+            drift.add(pk)
+    drift.update(expected)
+    return sorted(drift)
+
+
+class RecipeMatcher:
+    """Инвертированный индекс: ингредиент - отсортированные id рецептов.
+
+    Блоки списков читаются из IngredientPosting и хранятся в памяти
+    процесса массивами numpy по 4 байта на вхождение; для каждого
+    ингредиента блоки склеены в один список. При загрузке считается
+    число ингредиентов каждого рецепта. Раз в REFRESH_INTERVAL секунд
+    перечитываются только блоки, изменённые с прошлой проверки, с
+    запасом REFRESH_OVERLAP секунд на транзакции, зафиксированные позже
+    своей отметки времени. Весь индекс перестраивается при смене
+    переданной версии данных или по истечении INDEX_TTL секунд, как
+    индекс ингредиентов для автодополнения.
+    """
+
+    def __init__(self, ttl=INDEX_TTL, refresh_interval=REFRESH_INTERVAL):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._blocks = None
+        self._postings = None
+        self._sizes = None
+        self._version = None
+        self._built_at = 0
+        self._refreshed_at = 0
+        self._since = None
+
+    def _build(self):
+        self._blocks = load_postings(IngredientPosting.objects.all())
+        self._postings = {
+            pk: join_blocks(blocks) for pk, blocks in self._blocks.items()
+        }
+        filled = [
+            recipes for recipes in self._postings.values() if len(recipes)
+        ]
+        length = max((recipes[-1] for recipes in filled), default=-1) + 1
+        self._sizes = np.zeros(length, dtype=np.int64)
+        if filled:
+            self._sizes = np.bincount(np.concatenate(filled), minlength=length)
+
+    def _refresh(self):
+        """Применяет изменённые блоки, не трогая массивы у читателей."""
+        changed = load_postings(
+            IngredientPosting.objects.filter(
+                updated__gte=self._since - timedelta(seconds=REFRESH_OVERLAP)
+            )
+        )
+        if not changed:
+            return
+        postings = dict(self._postings)
+        sizes = self._sizes
+        for pk, blocks in changed.items():
+            old = self._blocks.setdefault(pk, {})
+            for block, recipes in blocks.items():
+                previous = old.get(block, recipes[:0])
+                length = int(recipes[-1]) + 1 if len(recipes) else 0
+                if length > len(sizes):
+                    sizes = np.pad(sizes, (0, length - len(sizes)))
+                elif sizes is self._sizes:
+                    sizes = sizes.copy()
+                np.subtract.at(sizes, previous, 1)
+                np.add.at(sizes, recipes, 1)
+                old[block] = recipes
+            postings[pk] = join_blocks(old)
+        self._postings, self._sizes = postings, sizes
+
+    def expire(self):
+        """Дочитать изменённые блоки при следующем запросе."""
+        self._refreshed_at = 0
+
+    def _get(self, version):
+        with self._lock:
+            now = time.monotonic()
+            expired = now - self._built_at > self.ttl
+            if self._postings is None or expired or version != self._version:
+                self._since = timezone.now()
+                self._build()
+                self._version = version
+                self._built_at = self._refreshed_at = now
+            elif now - self._refreshed_at > self.refresh_interval:
+                since = timezone.now()
+                self._refresh()
+                self._since = since
+                self._refreshed_at = now
+            return self._postings, self._sizes
+
+    def rank(self, candidates, matched, sizes):
+        """Порядок: доля имеющихся ингредиентов, совпадения, новизна."""
+        return candidates[
+            np.lexsort((-candidates, -matched, -matched / sizes))
+        ]
+
+    def contains_all(self, ingredients, version=None):
+        """Id рецептов, в которых есть все ингредиенты из списка.
+
+        Пересечение начинается с самого короткого списка, остальные
+        списки проверяются бинарным поиском.
+        """
+        postings, sizes = self._get(version)
+        ingredients = set(ingredients)
+        if not ingredients or not ingredients <= postings.keys():
+            return np.empty(0, dtype=POSTING_DTYPE)
+        lists = sorted((postings[pk] for pk in ingredients), key=len)
+        candidates = lists[0]
+        for recipes in lists[1:]:
+            if not len(candidates) or not len(recipes):
+                return np.empty(0, dtype=POSTING_DTYPE)
+            positions = np.searchsorted(recipes, candidates)
+            positions[positions == len(recipes)] = 0
+            candidates = candidates[recipes[positions] == candidates]
+        matched = np.full(len(candidates), len(lists))
+        return self.rank(candidates, matched, sizes[candidates])
+
+    def missing_at_most(self, ingredients, missing=0, version=None):
+        """Id рецептов, которым не хватает не больше missing ингредиентов.
+
+        Учитываются рецепты хотя бы с одним ингредиентом из списка.
+        Совпадения считаются через bincount по объединению списков,
+        поэтому работа пропорциональна их суммарной длине.
+        """
+        postings, sizes = self._get(version)
+        lists = [postings[pk] for pk in set(ingredients) if pk in postings]
+        if not lists:
+            return np.empty(0, dtype=POSTING_DTYPE)
+        counts = np.bincount(np.concatenate(lists), minlength=len(sizes))
+        candidates = np.flatnonzero(counts)
+        matched = counts[candidates]
+        keep = sizes[candidates] - matched <= missing
+        candidates, matched = candidates[keep], matched[keep]
+        return self.rank(candidates, matched, sizes[candidates])
+
+
+recipe_matcher = RecipeMatcher()
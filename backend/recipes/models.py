@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core import validators
 from django.db import models
 
@@ -44,6 +45,9 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Фото готового блюда', upload_to='recipes/', blank=False, null=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина фото', null=True, editable=False
+    )
     text = models.TextField('Описание рецепта')
     ingredients = models.ManyToManyField(
         Ingredient, through='RecipeIngredient'
@@ -60,11 +64,34 @@ class Recipe(models.Model):
         ],
     )
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное', default=0, editable=False
+    )
+    carts_count = models.PositiveIntegerField(
+        'Добавлений в корзину', default=0, editable=False
+    )
+    popularity = models.FloatField(
+        'Оценка популярности', default=0, editable=False
+    )
+    trending = models.FloatField('Оценка тренда', default=0, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'], name='recipe_author_date_idx'
+            ),
+            models.Index(fields=['pub_date', 'id'], name='recipe_date_id_idx'),
+            models.Index(
+                fields=['popularity', 'id'], name='recipe_popularity_id_idx'
+            ),
+            models.Index(
+                fields=['trending', 'id'], name='recipe_trending_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -124,6 +151,7 @@ class FavoriteRecipe(models.Model):
         related_name='favorite_recipe',
         verbose_name='Избранный рецепт',
     )
+    created = models.DateTimeField('Дата добавления', auto_now_add=True)
 
     class Meta:
         constraints = [
@@ -131,6 +159,9 @@ class FavoriteRecipe(models.Model):
                 fields=['user', 'recipe'], name='unique_favorite'
             )
         ]
+        indexes = [
+            models.Index(fields=['user', '-id'], name='favorite_user_id_idx')
+        ]
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
 
@@ -153,6 +184,7 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart_recipe',
         verbose_name='Покупка',
     )
+    created = models.DateTimeField('Дата добавления', auto_now_add=True)
 
     class Meta:
         constraints = [
@@ -160,6 +192,9 @@ class ShoppingCart(models.Model):
                 fields=['user', 'recipe'], name='unique_cart'
             )
         ]
+        indexes = [
+            models.Index(fields=['user', '-id'], name='cart_user_id_idx')
+        ]
         verbose_name = 'Покупка'
         verbose_name_plural = 'Покупки'
         ordering = ['-pk']
@@ -196,3 +231,159 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'Пользователь {self.user} подписан на {self.author}'
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.amount}'
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Рецепты в ленте'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_item'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_date_idx',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
+
+
+class RecipeActivity(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        verbose_name='Рецепт',
+    )
+    weight = models.FloatField('Вес')
+    created = models.DateTimeField('Время действия')
+
+    class Meta:
+        verbose_name = 'Действие с рецептом'
+        verbose_name_plural = 'Действия с рецептами'
+
+    def __str__(self):
+        return f'{self.recipe}: {self.weight:+}'
+
+
+class IngredientPosting(models.Model):
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='postings',
+        verbose_name='Ингредиент',
+    )
+    block = models.PositiveIntegerField('Блок id рецептов')
+    recipes = models.BinaryField('Id рецептов', default=b'')
+    updated = models.DateTimeField('Изменён', auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Рецепты ингредиента'
+        verbose_name_plural = 'Рецепты ингредиентов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ingredient', 'block'],
+                name='unique_ingredient_posting_block',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient}: {self.block}'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'], name='unique_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'], name='similar_recipe_score_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} - {self.similar}: {self.score:.2f}'
+
+
+class SimilarityUpdate(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='similarity_update',
+        verbose_name='Рецепт',
+    )
+
+    class Meta:
+        verbose_name = 'Рецепт для пересчёта похожих'
+        verbose_name_plural = 'Рецепты для пересчёта похожих'
+
+    def __str__(self):
+        return str(self.recipe)
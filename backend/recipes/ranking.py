@@ -0,0 +1,166 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import FavoriteRecipe, Recipe, RecipeActivity, ShoppingCart
+
+BATCH_SIZE = 1000
+EPOCH = datetime(2021, 1, 1, tzinfo=timezone.utc)
+RANKINGS = {
+    'popular': ('popularity', timedelta(days=30)),
+    'trending': ('trending', timedelta(days=1)),
+}
+ACTIVITY_WEIGHTS = {
+    FavoriteRecipe: 1.0,
+    ShoppingCart: 2.0,
+}
+CANCEL_EPSILON = 1e-9
+
+
+def get_ranking_ordering(name):
+    field, half_life = RANKINGS[name]
+    return f'-{field}', '-id'
+
+
+def get_score_fields():
+    return [field for field, half_life in RANKINGS.values()]
+
+
+def record_activity(item, removed=False):
+    """Записывает добавление или удаление рецепта из избранного или корзины.
+
+    Удаление записывается с датой исходного добавления и обратным
+    знаком, поэтому после пересчёта вклад добавления исчезает полностью.
+    """
+    weight = ACTIVITY_WEIGHTS[type(item)]
+    RecipeActivity.objects.create(
+        recipe_id=item.recipe_id,
+        weight=-weight if removed else weight,
+        created=item.created,
+    )
+
+
+def add_term(score, weight, created, half_life):
+    """Добавляет к оценке действие, затухающее с периодом half_life.
+
+    Оценка хранится как log2 суммы weight * 2 ** ((created - EPOCH) /
+    half_life). Все слагаемые делятся на одно и то же 2 ** ((now - EPOCH)
+    / half_life), поэтому порядок рецептов по сохранённой оценке совпадает
+    с порядком по затухшей на текущий момент сумме, а новое действие
+    просто прибавляется без пересчёта старых. Логарифм не даёт сумме
+    переполниться. Ноль означает отсутствие действий.
+    """
+    term = math.log2(abs(weight)) + (created - EPOCH) / half_life
+    if weight > 0:
+        if not score:
+            return term
+        high, low = max(score, term), min(score, term)
+        return high + math.log2(1 + 2 ** (low - high))
+    if not score or term >= score - CANCEL_EPSILON:
+        return 0.0
+    return score + math.log2(-math.expm1((term - score) * math.log(2)))
+
+
+def add_activity(scores, weight, created):
+    for field, half_life in RANKINGS.values():
+        scores[field] = add_term(scores[field], weight, created, half_life)
+
+
+def save_scores(scores):
+    Recipe.objects.bulk_update(
+        [Recipe(id=pk, **values) for pk, values in scores.items()],
+        get_score_fields(),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def apply_activity(batch_size=BATCH_SIZE):
+    """Применяет к оценкам очередную пачку действий.
+
+    Обработанные действия удаляются в той же транзакции, поэтому
+    таблица RecipeActivity - это очередь изменений с последнего запуска.
+    В отличие от отметки по id, так не теряются строки транзакций,
+    которые зафиксировались позже транзакций с большими id.
+    Возвращает число обработанных действий.
+    """
+    fields = get_score_fields()
+    with transaction.atomic():
+        events = list(
+            RecipeActivity.objects.select_for_update()
+            .order_by('id')
+            .values_list('id', 'recipe_id', 'weight', 'created')[:batch_size]
+        )
+        if not events:
+            return 0
+        scores = {
+            pk: dict(zip(fields, values))
+            for pk, *values in Recipe.objects.select_for_update()
+            .filter(id__in={event[1] for event in events})
+            .values_list('id', *fields)
+        }
+        for _, recipe_id, weight, created in events:
+            add_activity(scores[recipe_id], weight, created)
+        save_scores(scores)
+        RecipeActivity.objects.filter(
+            id__in=[event[0] for event in events]
+        ).delete()
+    return len(events)
+
+
+def update_scores(batch_size=BATCH_SIZE):
+    """Применяет все накопленные действия, возвращает их число."""
+    total = 0
+    while True:
+        processed = apply_activity(batch_size)
+        if not processed:
+            return total
+        total += processed
+
+
+def compute_scores():
+    """Оценки рецептов, посчитанные заново по избранному и корзинам."""
+    fields = get_score_fields()
+    scores = defaultdict(lambda: dict.fromkeys(fields, 0.0))
+    for model, weight in ACTIVITY_WEIGHTS.items():
+        for recipe_id, created in model.objects.values_list(
+            'recipe_id', 'created'
+        ).iterator():
+            add_activity(scores[recipe_id], weight, created)
+    return scores
+
+
+def rebuild_scores():
+    """Пересчитывает оценки всех рецептов и очищает очередь действий."""
+    with transaction.atomic():
+        last = RecipeActivity.objects.aggregate(last=Max('id'))['last']
+        scores = compute_scores()
+        Recipe.objects.update(**dict.fromkeys(get_score_fields(), 0.0))
+        save_scores(scores)
+        if last is not None:
+            RecipeActivity.objects.filter(id__lte=last).delete()
+    return len(scores)
+
+
+def find_score_drift(tolerance=1e-6):
+    """Id рецептов, чьи оценки расходятся с пересчитанными заново.
+
+    Рецепты с необработанными действиями не проверяются.
+    """
+    fields = get_score_fields()
+    expected = compute_scores()
+    pending = set(RecipeActivity.objects.values_list('recipe_id', flat=True))
+    drift = []
+    for pk, *values in Recipe.objects.values_list('id', *fields).iterator():
+        if pk in pending:
+            continue
+        actual = dict(zip(fields, values))
+        target = expected.get(pk, dict.fromkeys(fields, 0.0))
+        if any(
+            abs(actual[field] - target[field]) > tolerance for field in fields
+        ):
+            drift.append(pk)
+    return drift
@@ -0,0 +1,105 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import (Case, Exists, F, Func, IntegerField, OuterRef, Q,
+                              Subquery, TextField, Value, When)
+from django.db.models.functions import Lower
+
+from .models import Recipe, RecipeIngredient
+
+SEARCH_CONFIG = 'russian'
+
+
+def is_full_text_available():
+    return connection.vendor == 'postgresql'
+
+
+def casefold(value):
+    return value.casefold() if value is not None else None
+
+
+class Casefold(Func):
+    """casefold() из Python, зарегистрированная в SQLite при подключении.
+
+    Встроенные LOWER и LIKE в SQLite меняют регистр только у ASCII.
+    """
+
+    function = 'CASEFOLD'
+    output_field = TextField()
+
+
+def fold(expression):
+    if connection.vendor == 'sqlite':
+        return Casefold(expression)
+    return Lower(expression)
+
+
+def build_search_vector():
+    """tsvector рецепта: название, ингредиенты и описание с весами A-C."""
+    ingredients = Subquery(
+        RecipeIngredient.objects.filter(recipe=OuterRef('pk'))
+        .order_by()
+        .values('recipe')
+        .annotate(names=StringAgg('ingredient__name', delimiter=' '))
+        .values('names'),
+        output_field=TextField(),
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredients, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipes=None):
+    """Пересчитывает сохранённые tsvector для рецептов.
+
+    Без аргумента обновляет все рецепты. На базах кроме PostgreSQL
+    поле не используется и ничего не делает.
+    """
+    if not is_full_text_available():
+        return 0
+    queryset = Recipe.objects.all()
+    if recipes is not None:
+        queryset = queryset.filter(pk__in=recipes)
+    return queryset.update(search_vector=build_search_vector())
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по запросу и сортирует по релевантности.
+
+    На PostgreSQL используется сохранённый tsvector с GIN-индексом и
+    ts_rank, на остальных базах - поиск подстроки без учёта регистра,
+    где совпадения в названии идут первыми.
+    """
+    if is_full_text_available():
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .order_by('-rank', '-pub_date', '-id')
+        )
+    query = casefold(query)
+    return (
+        queryset.alias(folded_name=fold('name'), folded_text=fold('text'))
+        .filter(
+            Q(folded_name__contains=query)
+            | Q(folded_text__contains=query)
+            | Exists(
+                RecipeIngredient.objects.alias(
+                    folded_name=fold('ingredient__name')
+                ).filter(recipe=OuterRef('pk'), folded_name__contains=query)
+            )
+        )
+        .annotate(
+            rank=Case(
+                When(folded_name__contains=query, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by('-rank', '-pub_date', '-id')
+    )
@@ -0,0 +1,119 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def calculate_totals(users=None, ingredients=None):
+    """Суммы ингредиентов по корзинам, посчитанные по исходным таблицам."""
+    lookups = {'recipe__shopping_cart_recipe__isnull': False}
+    if users is not None:
+        lookups['recipe__shopping_cart_recipe__user__in'] = users
+    if ingredients is not None:
+        lookups['ingredient__in'] = ingredients
+    return (
+        RecipeIngredient.objects.filter(**lookups)
+        .values('recipe__shopping_cart_recipe__user', 'ingredient')
+        .annotate(total=Sum('amount'))
+        .order_by()
+        .iterator()
+    )
+
+
+def refresh_totals(users, ingredients):
+    """Пересчитывает строки списка покупок для пар пользователь-ингредиент.
+
+    Вызывается внутри транзакции, которая меняет корзину или состав
+    рецепта, поэтому таблица итогов не расходится с исходными данными.
+    Строки пользователей блокируются по порядку id: иначе две транзакции
+    могут удалить одни и те же строки и обе вставить их заново.
+    """
+    users = sorted(set(users))
+    ingredients = list(ingredients)
+    if not users or not ingredients:
+        return
+    list(
+        get_user_model()
+        .objects.select_for_update()
+        .filter(id__in=users)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    ShoppingListItem.objects.filter(
+        user__in=users, ingredient__in=ingredients
+    ).delete()
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=row['recipe__shopping_cart_recipe__user'],
+                ingredient_id=row['ingredient'],
+                amount=row['total'],
+            )
+            for row in calculate_totals(users, ingredients)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def get_recipe_ingredients(recipe):
+    return list(
+        RecipeIngredient.objects.filter(recipe=recipe).values_list(
+            'ingredient_id', flat=True
+        )
+    )
+
+
+def get_recipe_buyers(recipe):
+    return list(
+        ShoppingCart.objects.filter(recipe=recipe).values_list(
+            'user_id', flat=True
+        )
+    )
+
+
+def refresh_cart(user, recipe):
+    """Обновляет итоги после добавления рецепта в корзину или удаления."""
+    refresh_totals([user.id], get_recipe_ingredients(recipe))
+
+
+def refresh_recipe(recipe, ingredients):
+    """Обновляет итоги у всех, чья корзина содержит изменённый рецепт."""
+    refresh_totals(get_recipe_buyers(recipe), ingredients)
+
+
+def rebuild_totals():
+    ShoppingListItem.objects.all().delete()
+    items = (
+        ShoppingListItem(
+            user_id=row['recipe__shopping_cart_recipe__user'],
+            ingredient_id=row['ingredient'],
+            amount=row['total'],
+        )
+        for row in calculate_totals()
+    )
+    ShoppingListItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+
+
+def find_drift():
+    """Возвращает пары (user_id, ingredient_id), где итоги расходятся."""
+    expected = {
+        (row['recipe__shopping_cart_recipe__user'], row['ingredient']): row[
+            'total'
+        ]
+        for row in calculate_totals()
+    }
+    stored = {
+        (user, ingredient): amount
+        for user, ingredient, amount in (
+            ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            ).iterator()
+        )
+    }
+    return sorted(
+        key
+        for key in expected.keys() | stored.keys()
+        if expected.get(key) != stored.get(key)
+    )
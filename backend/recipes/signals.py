@@ -0,0 +1,140 @@
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .images import create_renditions, delete_renditions
+from .ingredient_index import ingredient_index
+from .models import Ingredient, Recipe
+from .search import casefold
+
+logger = logging.getLogger(__name__)
+
+DDL = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_tags_tag_recipe '
+    'ON recipes_recipe_tags (tag_id, recipe_id)',
+)
+
+POSTGRES_DDL = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector '
+    'ON recipes_recipe USING gin (search_vector)',
+)
+
+TRIGRAM_DDL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm '
+    'ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)',
+)
+
+
+@receiver(connection_created)
+def register_sqlite_functions(connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('CASEFOLD', 1, casefold)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+
+
+def update_image_renditions(recipe, replace=False):
+    """Создаёт копии изображения и сохраняет ширину его оригинала."""
+    width = create_renditions(recipe.image, recipe.image_width, replace)
+    if width != recipe.image_width:
+        Recipe.objects.filter(pk=recipe.pk, image=recipe.image.name).update(
+            image_width=width
+        )
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_old_image(instance, update_fields=None, **kwargs):
+    """Запоминает прежнее изображение и ширину, чтобы удалить его копии."""
+    instance._old_image = None
+    if instance.pk is None or (
+        update_fields is not None and 'image' not in update_fields
+    ):
+        return
+    instance._old_image = (
+        Recipe.objects.filter(pk=instance.pk)
+        .values_list('image', 'image_width')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def create_image_renditions(instance, created, update_fields=None, **kwargs):
+    """Копии создаются после фиксации транзакции, вне её блокировок.
+
+    При смене изображения ширина сбрасывается, и старые копии не
+    отдаются для нового изображения; копии прежнего файла удаляются,
+    а копии нового создаются заново, даже если имя файла совпало.
+    """
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    old_name, old_width = getattr(instance, '_old_image', None) or ('', None)
+    if not (
+        created
+        or update_fields is not None
+        or old_name != instance.image.name
+    ):
+        return
+    if instance.image_width is not None:
+        Recipe.objects.filter(pk=instance.pk).update(image_width=None)
+        instance.image_width = None
+    storage = instance.image.storage
+    if old_name and old_name != instance.image.name:
+        transaction.on_commit(
+            lambda: delete_renditions(storage, old_name, old_width)
+        )
+    if instance.image:
+        transaction.on_commit(
+            lambda: update_image_renditions(instance, replace=True)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_renditions(instance, **kwargs):
+    if instance.image:
+        name, width = instance.image.name, instance.image_width
+        storage = instance.image.storage
+        transaction.on_commit(lambda: delete_renditions(storage, name, width))
+
+
+def create_extra_indexes(using, **kwargs):
+    """Индексы, которые нельзя описать в Meta моделей Django 3.2.
+
+    Сюда относятся индексы на автоматической промежуточной таблице тегов
+    и индексы, которые требуют расширений PostgreSQL. Ошибка прерывает
+    миграцию; только при TRIGRAM_INDEX_REQUIRED=False триграммный индекс
+    пропускается, если расширение pg_trgm недоступно.
+    """
+    connection = connections[using]
+    statements = DDL
+    if connection.vendor == 'postgresql':
+        statements += POSTGRES_DDL
+    for statement in statements:
+        execute_ddl(connection, using, statement)
+    if connection.vendor != 'postgresql':
+        return
+    try:
+        for statement in TRIGRAM_DDL:
+            execute_ddl(connection, using, statement)
+    except DatabaseError as error:
+        if settings.TRIGRAM_INDEX_REQUIRED:
+            raise
+        logger.warning('Триграммный индекс не создан: %s', error)
+
+
+def execute_ddl(connection, using, statement):
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(statement)
+
+
+def connect_post_migrate(app_config):
+    post_migrate.connect(create_extra_indexes, sender=app_config)
@@ -0,0 +1,377 @@
+import itertools
+
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from .models import Recipe, RecipeIngredient, SimilarityUpdate, SimilarRecipe
+
+SIMILAR_COUNT = 10
+TAG_WEIGHT = 0.5
+BATCH_SIZE = 200
+WRITE_BATCH_SIZE = 5000
+SCORE_EPSILON = 1e-9
+
+
+def mark_stale(recipes):
+    """Ставит рецепты в очередь пересчёта похожих."""
+    SimilarityUpdate.objects.bulk_create(
+        [SimilarityUpdate(recipe_id=pk) for pk in recipes],
+        ignore_conflicts=True,
+    )
+
+
+def mark_neighbours_stale(recipes):
+    """Ставит в очередь рецепты, у которых есть recipes среди похожих.
+
+    Сами recipes в очередь не попадают: функция вызывается перед их
+    удалением.
+    """
+    mark_stale(
+        SimilarRecipe.objects.filter(similar_id__in=recipes)
+        .exclude(recipe_id__in=recipes)
+        .values_list('recipe_id', flat=True)
+        .distinct()
+    )
+
+
+def load_columns(queryset, fields, dtype=np.int64):
+    rows = queryset.order_by().values_list(*fields).iterator()
+    return np.fromiter(
+        itertools.chain.from_iterable(rows), dtype=dtype
+    ).reshape(-1, len(fields))
+
+
+def get_neighbours(recipes):
+    """Id рецептов с общим ингредиентом или тегом с recipes."""
+    through = Recipe.tags.through.objects
+    ingredients = RecipeIngredient.objects.filter(recipe_id__in=recipes)
+    tags = through.filter(recipe_id__in=recipes)
+    return np.union1d(
+        load_columns(
+            RecipeIngredient.objects.filter(
+                ingredient_id__in=ingredients.values('ingredient_id')
+            ),
+            ('recipe_id',),
+        )[:, 0],
+        load_columns(
+            through.filter(tag_id__in=tags.values('tag_id')), ('recipe_id',)
+        )[:, 0],
+    )
+
+
+def get_rows(ids, recipes):
+    """Позиции существующих рецептов recipes в отсортированных ids."""
+    recipes = np.asarray(recipes, dtype=np.int64)
+    if not len(ids):
+        return recipes[:0]
+    rows = np.searchsorted(ids, recipes).clip(max=len(ids) - 1)
+    return np.unique(rows[ids[rows] == recipes])
+
+
+def build_matrix(recipes=None):
+    """Разреженная матрица рецепты x признаки с нормированными строками.
+
+    Признаки - ингредиенты с весом 1 и теги с весом TAG_WEIGHT, поэтому
+    произведение двух строк - косинусное сходство рецептов. Возвращает
+    отсортированные id рецептов и матрицу CSR в том же порядке строк.
+    Если передан список recipes, в матрицу попадают только эти рецепты.
+    """
+    queryset = Recipe.objects.all()
+    ingredients = RecipeIngredient.objects.all()
+    tags = Recipe.tags.through.objects.all()
+    if recipes is not None:
+        queryset = queryset.filter(pk__in=recipes)
+        ingredients = ingredients.filter(recipe_id__in=recipes)
+        tags = tags.filter(recipe_id__in=recipes)
+    ids = load_columns(queryset, ('id',))[:, 0]
+    ids.sort()
+    ingredients = load_columns(ingredients, ('recipe_id', 'ingredient_id'))
+    tags = load_columns(tags, ('recipe_id', 'tag_id'))
+    features = []
+    offset = 0
+    for pairs, weight in ((ingredients, 1.0), (tags, TAG_WEIGHT)):
+        pairs = pairs[np.isin(pairs[:, 0], ids)]
+        values, columns = np.unique(pairs[:, 1], return_inverse=True)
+        features.append(
+            (
+                np.searchsorted(ids, pairs[:, 0]),
+                columns.ravel() + offset,
+                np.full(len(pairs), weight),
+            )
+        )
+        offset += len(values)
+    rows, columns, data = (np.concatenate(parts) for parts in zip(*features))
+    matrix = sparse.csr_matrix(
+        (data, (rows, columns)), shape=(len(ids), offset)
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return ids, (sparse.diags(1 / norms) @ matrix).tocsr()
+
+
+def iter_products(matrix, transposed, rows):
+    """Сходство строк rows со всеми рецептами, пачками по BATCH_SIZE.
+
+    Для каждой строки возвращает позиции рецептов с ненулевым сходством,
+    кроме самого рецепта, и значения сходства.
+    """
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        products = (matrix[batch] @ transposed).tocsr()
+        for offset, row in enumerate(batch):
+            begin = products.indptr[offset]
+            end = products.indptr[offset + 1]
+            columns = products.indices[begin:end]
+            values = products.data[begin:end]
+            keep = (columns != row) & (values > 0)
+            yield row, columns[keep], values[keep]
+
+
+def select_top(columns, values, count):
+    """count лучших по сходству, при равенстве - более новые рецепты."""
+    if len(values) > count:
+        threshold = np.partition(values, len(values) - count)[-count]
+        keep = values >= threshold
+        columns, values = columns[keep], values[keep]
+    order = np.lexsort((-columns, -values))[:count]
+    return columns[order], values[order]
+
+
+def empty_top(length, count):
+    return (
+        np.full((length, count), -1, dtype=np.int64),
+        np.zeros((length, count)),
+    )
+
+
+def set_top(row, columns, values, top, scores):
+    columns, values = select_top(columns, values, top.shape[1])
+    top[row] = -1
+    scores[row] = 0
+    top[row, :len(columns)] = columns
+    scores[row, :len(values)] = values
+
+
+def compute_top(matrix, transposed, rows, top, scores):
+    for row, columns, values in iter_products(matrix, transposed, rows):
+        set_top(row, columns, values, top, scores)
+
+
+def load_stored(recipes=None):
+    """Сохранённые похожие рецепты: строки recipe_id, similar_id, score."""
+    queryset = SimilarRecipe.objects.all()
+    if recipes is not None:
+        queryset = queryset.filter(recipe_id__in=recipes)
+    return load_columns(
+        queryset, ('recipe_id', 'similar_id', 'score'), dtype=np.float64
+    )
+
+
+def load_top(ids, count=SIMILAR_COUNT, stored=None):
+    """Сохранённые похожие рецепты в виде массивов позиций и оценок."""
+    top, scores = empty_top(len(ids), count)
+    if stored is None:
+        stored = load_stored()
+    if not len(ids) or not len(stored):
+        return top, scores
+    recipes = stored[:, 0].astype(np.int64)
+    similar = stored[:, 1].astype(np.int64)
+    rows = np.searchsorted(ids, recipes).clip(max=len(ids) - 1)
+    columns = np.searchsorted(ids, similar).clip(max=len(ids) - 1)
+    keep = (ids[rows] == recipes) & (ids[columns] == similar)
+    rows, columns, values = rows[keep], columns[keep], stored[keep, 2]
+    order = np.lexsort((-columns, -values, rows))
+    rows, columns, values = rows[order], columns[order], values[order]
+    _, starts, inverse = np.unique(
+        rows, return_index=True, return_inverse=True
+    )
+    ranks = np.arange(len(rows)) - starts[inverse.ravel()]
+    keep = ranks < count
+    top[rows[keep], ranks[keep]] = columns[keep]
+    scores[rows[keep], ranks[keep]] = values[keep]
+    return top, scores
+
+
+def save_top(ids, rows, top, scores):
+    """Заменяет сохранённые похожие рецепты для строк rows."""
+    rows = np.asarray(sorted(rows), dtype=np.int64)
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        SimilarRecipe.objects.filter(
+            recipe_id__in=ids[rows[start:start + WRITE_BATCH_SIZE]].tolist()
+        ).delete()
+    SimilarRecipe.objects.bulk_create(
+        (
+            SimilarRecipe(
+                recipe_id=int(ids[row]),
+                similar_id=int(ids[column]),
+                score=float(score),
+            )
+            for row in rows
+            for column, score in zip(top[row], scores[row])
+            if column >= 0
+        ),
+        batch_size=WRITE_BATCH_SIZE,
+    )
+
+
+def propagate(row, columns, values, top, scores, skip):
+    """Обновляет списки других рецептов после изменения рецепта row.
+
+    Сходство симметрично, поэтому строка row даёт новое сходство со
+    всеми рецептами. Рецепт row добавляется в списки, где он теперь
+    лучше последнего места, и получает новую оценку там, где уже был.
+    Если оценка уменьшилась, следующий кандидат неизвестен, и такие
+    списки возвращаются для полного пересчёта. Возвращает множества
+    изменённых строк и строк для пересчёта.
+    """
+    similarity = np.zeros(len(top))
+    similarity[columns] = values
+    holds = top == row
+    skip = list(skip)
+    holders, slots = np.nonzero(holds)
+    keep = ~np.isin(holders, skip)
+    holders, slots = holders[keep], slots[keep]
+    new = similarity[holders]
+    decreased = new < scores[holders, slots] - SCORE_EPSILON
+    recompute = set(holders[decreased].tolist())
+    holders, slots = holders[~decreased], slots[~decreased]
+    scores[holders, slots] = new[~decreased]
+    candidates = np.setdiff1d(columns, np.nonzero(holds.any(axis=1))[0])
+    candidates = candidates[~np.isin(candidates, skip)]
+    last_score = scores[candidates, -1]
+    better = (similarity[candidates] > last_score) | (
+        (similarity[candidates] == last_score)
+        & (row > top[candidates, -1])
+    )
+    candidates = candidates[better]
+    top[candidates, -1] = row
+    scores[candidates, -1] = similarity[candidates]
+    touched = np.union1d(holders, candidates)
+    order = np.lexsort((-top[touched], -scores[touched]))
+    top[touched] = np.take_along_axis(top[touched], order, axis=1)
+    scores[touched] = np.take_along_axis(scores[touched], order, axis=1)
+    return set(touched.tolist()), recompute
+
+
+def claim_stale():
+    """Забирает рецепты из очереди SimilarityUpdate.
+
+    Очередь очищается в отдельной короткой транзакции: пока идёт
+    пересчёт, mark_stale не ждёт блокировок, а изменения, зафиксированные
+    позже, снова попадут в очередь.
+    """
+    with transaction.atomic():
+        stale = list(
+            SimilarityUpdate.objects.select_for_update(
+                skip_locked=True
+            ).values_list('recipe_id', flat=True)
+        )
+        SimilarityUpdate.objects.filter(recipe_id__in=stale).delete()
+    return stale
+
+
+def recompute_similar(recipes, count=SIMILAR_COUNT):
+    """Заново считает списки recipes по матрице их окрестности."""
+    recipes = np.asarray(recipes, dtype=np.int64)
+    ids, matrix = build_matrix(
+        np.union1d(get_neighbours(recipes.tolist()), recipes).tolist()
+    )
+    top, scores = empty_top(len(ids), count)
+    rows = get_rows(ids, recipes)
+    compute_top(matrix, matrix.T.tocsr(), rows, top, scores)
+    return ids, rows, top, scores
+
+
+def update_similar(count=SIMILAR_COUNT):
+    """Пересчитывает похожие для рецептов из очереди SimilarityUpdate.
+
+    Матрица строится только по рецептам из очереди, рецептам с общими
+    с ними признаками и тем, у кого они есть в списках; с остальными
+    сходство нулевое. Списки рецептов из очереди считаются заново,
+    остальные меняются только там, где изменилось сходство с этими
+    рецептами. Если сходство уменьшилось, список пересчитывается по
+    своей окрестности. Запись идёт одной транзакцией в конце, при ошибке
+    рецепты возвращаются в очередь. Возвращает число рецептов из очереди
+    и число перезаписанных списков.
+    """
+    stale = claim_stale()
+    if not stale:
+        return 0, 0
+    try:
+        saved = refresh_similar(stale, count)
+    except Exception:
+        mark_stale(
+            Recipe.objects.filter(pk__in=stale).values_list('pk', flat=True)
+        )
+        raise
+    return len(stale), saved
+
+
+def refresh_similar(stale, count=SIMILAR_COUNT):
+    holders = SimilarRecipe.objects.filter(similar_id__in=stale).values_list(
+        'recipe_id', flat=True
+    )
+    loaded = np.union1d(
+        get_neighbours(stale),
+        np.asarray(list(holders) + stale, dtype=np.int64),
+    )
+    stored = load_stored(loaded.tolist())
+    ids, matrix = build_matrix(
+        np.union1d(loaded, stored[:, 1].astype(np.int64)).tolist()
+    )
+    if not len(ids):
+        return 0
+    top, scores = load_top(ids, count, stored)
+    transposed = matrix.T.tocsr()
+    changed = get_rows(ids, stale)
+    skip = set(changed.tolist())
+    touched = set()
+    for row, columns, values in iter_products(matrix, transposed, changed):
+        set_top(row, columns, values, top, scores)
+        rows, recompute = propagate(row, columns, values, top, scores, skip)
+        touched |= rows
+        skip |= recompute
+    recompute = sorted(skip - set(changed.tolist()))
+    saved = (skip | touched) - set(recompute)
+    with transaction.atomic():
+        save_top(ids, saved, top, scores)
+        if recompute:
+            save_top(*recompute_similar(ids[recompute], count))
+    return len(saved) + len(recompute)
+
+
+def rebuild_similar(count=SIMILAR_COUNT):
+    """Пересчитывает похожие для всех рецептов."""
+    with transaction.atomic():
+        SimilarityUpdate.objects.all().delete()
+        ids, matrix = build_matrix()
+        top, scores = empty_top(len(ids), count)
+        compute_top(
+            matrix, matrix.T.tocsr(), np.arange(len(ids)), top, scores
+        )
+        SimilarRecipe.objects.all().delete()
+        save_top(ids, range(len(ids)), top, scores)
+    return len(ids)
+
+
+def find_similar_drift(count=SIMILAR_COUNT, tolerance=1e-6):
+    """Id рецептов, чьи сохранённые похожие расходятся с пересчётом.
+
+    Рецепты из очереди пересчёта не проверяются.
+    """
+    ids, matrix = build_matrix()
+    expected_top, expected_scores = empty_top(len(ids), count)
+    compute_top(
+        matrix,
+        matrix.T.tocsr(),
+        np.arange(len(ids)),
+        expected_top,
+        expected_scores,
+    )
+    top, scores = load_top(ids, count)
+    drift = (top != expected_top).any(axis=1) | (
+        np.abs(scores - expected_scores) > tolerance
+    ).any(axis=1)
+    pending = set(SimilarityUpdate.objects.values_list('recipe_id', flat=True))
+    return [pk for pk in ids[drift].tolist() if pk not in pending]
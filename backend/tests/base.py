@@ -0,0 +1,103 @@
+import base64
+import io
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteRecipe, Follow, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), 'red').save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name='recipe.png')
+
+
+def encode_image(width=20, height=20):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'green').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, QUERY_BUDGET_STRICT=True)
+class RecipesTestCase(TestCase):
+    """Пользователи, теги, ингредиенты и 12 рецептов с избранным."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author, cls.other = (
+            User.objects.create_user(
+                email=f'{name}@example.com',
+                username=name,
+                password='password',
+                first_name=name,
+                last_name=name,
+            )
+            for name in ('user', 'author', 'other')
+        )
+        cls.breakfast, cls.lunch = (
+            Tag.objects.create(name=slug, color=color, slug=slug)
+            for slug, color in (('breakfast', '#E26C2D'), ('lunch', '#49B64E'))
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'сахар', 'мука', 'молоко')
+        ]
+        cls.recipes = []
+        for number in range(12):
+            recipe = Recipe.objects.create(
+                author=cls.author if number % 2 else cls.other,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10 + number,
+                image=make_image(),
+            )
+            recipe.tags.set(
+                [cls.breakfast, cls.lunch][:1 + number % 2]
+                if number % 3
+                else [cls.lunch]
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in cls.ingredients[:1 + number % 4]
+            )
+            cls.recipes.append(recipe)
+        cls.favorited = cls.recipes[1:5]
+        cls.in_cart = cls.recipes[4:7]
+        FavoriteRecipe.objects.bulk_create(
+            FavoriteRecipe(user=cls.user, recipe=recipe)
+            for recipe in cls.favorited
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe=recipe)
+            for recipe in cls.in_cart
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous_client = APIClient()
+        self.user_client = APIClient()
+        self.user_client.force_authenticate(self.user)
+
+    def get_ids(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['id'] for recipe in response.json()['results']]
@@ -0,0 +1,85 @@
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from rest_framework.authtoken.models import Token
+
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import rebuild_totals
+
+from .base import RecipesTestCase
+
+
+class ASGITest(RecipesTestCase):
+    """Запросы через настоящий ASGIHandler, как в профиле ASGI.
+
+    В отличие от тестового клиента, ASGIHandler читает потоковые ответы
+    в цикле событий, где обращения к базе запрещены.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        rebuild_totals()
+        cls.token = Token.objects.create(user=cls.user)
+
+    def get(self, path, query=''):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+            'server': ('testserver', 80),
+            'client': ('127.0.0.1', 50000),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        # Как и тестовый клиент, не закрываем соединение транзакции теста.
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            async_to_sync(ASGIHandler())(scope, receive, send)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        return messages[0]['status'], body
+
+    def test_download_shopping_cart(self):
+        for file_type in ('txt', 'csv'):
+            with self.subTest(file_type=file_type):
+                status, body = self.get(
+                    '/api/recipes/download_shopping_cart/',
+                    f'type={file_type}',
+                )
+                self.assertEqual(status, 200)
+                expected = self.user_client.get(
+                    '/api/recipes/download_shopping_cart/',
+                    {'type': file_type},
+                )
+                self.assertEqual(body, b''.join(expected.streaming_content))
+                items = ShoppingListItem.objects.filter(user=self.user)
+                self.assertEqual(
+                    len(body.decode().strip().splitlines()),
+                    1 + items.count(),
+                )
+
+    def test_tags(self):
+        status, body = self.get('/api/tags/')
+        self.assertEqual(status, 200)
+        self.assertIn(b'breakfast', body)
@@ -0,0 +1,40 @@
+import io
+
+from django.core.management import call_command
+
+from recipes.models import Recipe
+
+from .base import RecipesTestCase
+
+
+class BenchmarkCommandsTest(RecipesTestCase):
+    """Замеры проходят для гостя и пользователя и не меняют базу."""
+
+    def call(self, command, **options):
+        output = io.StringIO()
+        call_command(command, stdout=output, **options)
+        return output.getvalue()
+
+    def test_benchmark_api(self):
+        count = Recipe.objects.count()
+        anonymous = self.call('benchmark_api', repeat=1)
+        self.assertNotIn('users-me', anonymous)
+        self.assertNotIn('recipes-feed', anonymous)
+        self.assertNotIn('пропущен', anonymous)
+        output = self.call('benchmark_api', repeat=1, email=self.user.email)
+        for name in (
+            'recipes-create',
+            'recipes-update',
+            'recipes-delete',
+            'recipes-feed',
+        ):
+            self.assertIn(name, output)
+        self.assertNotIn('пропущен', output)
+        self.assertEqual(Recipe.objects.count(), count)
+
+    def test_explain_queries(self):
+        output = self.call('explain_queries')
+        self.assertIn('recipes-list: 200', output)
+        self.assertIn('recipes-match: 200', output)
+        self.assertIn('recipes-similar: 200', output)
+        self.assertNotIn('users-me', output)
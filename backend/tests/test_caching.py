@@ -0,0 +1,47 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+
+from api.models import ModelVersion
+from recipes.models import Tag
+
+from .base import RecipesTestCase
+
+
+class ModelVersionTest(RecipesTestCase):
+    def get_tags(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.anonymous_client.get('/api/tags/', **headers)
+
+    def test_not_modified(self):
+        response = self.get_tags()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.get_tags(response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_in_this_process(self):
+        etag = self.get_tags()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='ужин', color='#8775D2', slug='dinner')
+        response = self.get_tags(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+
+    def test_write_in_another_process(self):
+        """Другой процесс меняет таблицу версий, но не наш кеш."""
+        etag = self.get_tags()['ETag']
+        Tag.objects.bulk_create(
+            [Tag(name='ужин', color='#8775D2', slug='dinner')]
+        )
+        ModelVersion.objects.update_or_create(
+            model='recipes.tag', defaults={'version': time.time()}
+        )
+        self.assertEqual(self.get_tags(etag).status_code, 304)
+        later = time.time() + settings.MODEL_VERSION_TTL + 1
+        with mock.patch('time.time', return_value=later):
+            response = self.get_tags(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
@@ -0,0 +1,59 @@
+import io
+
+from django.contrib.admin.sites import site
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from recipes import matching, similarity
+from recipes.admin import RecipeAdmin
+from recipes.models import Recipe, SimilarityUpdate
+from recipes.shopping_list import find_drift, rebuild_totals
+from users.models import User
+
+from .base import RecipesTestCase
+
+
+class DeleteRecipesTest(RecipesTestCase):
+    """Удаление из админки обновляет те же данные, что и удаление в API."""
+
+    def setUp(self):
+        super().setUp()
+        for author in (self.author, self.other):
+            User.objects.filter(pk=author.pk).update(
+                recipes_count=author.recipes.count()
+            )
+        rebuild_totals()
+        matching.rebuild_postings()
+        similarity.rebuild_similar()
+        self.deleted = [recipe.pk for recipe in self.in_cart[:2]]
+
+    def assert_consistent(self):
+        self.assertEqual(find_drift(), [])
+        call_command(
+            'rebuild_ingredient_postings', check=True, stdout=io.StringIO()
+        )
+        for author in (self.author, self.other):
+            self.assertEqual(
+                User.objects.get(pk=author.pk).recipes_count,
+                author.recipes.count(),
+            )
+        stale = set(
+            SimilarityUpdate.objects.values_list('recipe_id', flat=True)
+        )
+        self.assertTrue(stale)
+        self.assertFalse(stale & set(self.deleted))
+
+    def test_admin_delete_queryset(self):
+        RecipeAdmin(Recipe, site).delete_queryset(
+            None, Recipe.objects.filter(pk__in=self.deleted)
+        )
+        self.assertFalse(Recipe.objects.filter(pk__in=self.deleted).exists())
+        self.assert_consistent()
+
+    def test_api_delete(self):
+        self.deleted = self.deleted[1:]
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.delete(f'/api/recipes/{self.deleted[0]}/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_consistent()
@@ -0,0 +1,135 @@
+import datetime as dt
+import io
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.feed import find_feed_drift, get_feed_ids, rebuild_inboxes
+from recipes.models import FeedItem, Follow, Recipe
+
+from .base import RecipesTestCase, encode_image
+
+
+class FeedTest(RecipesTestCase):
+    """Лента подписок из слияния потоков авторов и из FeedItem."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        start = timezone.now() - dt.timedelta(days=1)
+        for number, recipe in enumerate(cls.recipes):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=start + dt.timedelta(hours=number // 3)
+            )
+
+    def get_expected(self, *authors):
+        return list(
+            Recipe.objects.filter(author__in=authors)
+            .order_by('-pub_date', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def get_inbox(self):
+        return set(
+            FeedItem.objects.filter(user=self.user).values_list(
+                'recipe_id', flat=True
+            )
+        )
+
+    def read_feed(self, limit=4):
+        ids = []
+        url = f'/api/recipes/feed/?limit={limit}'
+        while url:
+            response = self.user_client.get(url)
+            ids += self.get_ids(response)
+            url = response.json()['next']
+        return ids
+
+    def subscribe(self, author, method='post'):
+        response = getattr(self.user_client, method)(
+            f'/api/users/{author.pk}/subscribe/'
+        )
+        self.assertIn(response.status_code, (201, 204), response.content)
+
+    def test_merge_order(self):
+        Follow.objects.create(user=self.user, author=self.other)
+        expected = self.get_expected(self.author, self.other)
+        for threshold in (0, 2):
+            with self.subTest(threshold=threshold), override_settings(
+                FEED_INBOX_MIN_FOLLOWS=threshold
+            ):
+                rebuild_inboxes()
+                self.assertEqual(self.read_feed(), expected)
+                recipe = Recipe.objects.get(pk=expected[4])
+                self.assertEqual(
+                    get_feed_ids(
+                        self.user, (recipe.pub_date, recipe.pk), 100
+                    ),
+                    expected[5:],
+                )
+
+    @override_settings(FEED_INBOX_MIN_FOLLOWS=2)
+    def test_switch_to_inbox(self):
+        self.assertEqual(self.get_inbox(), set())
+        self.subscribe(self.other)
+        self.assertEqual(
+            self.get_inbox(), set(self.get_expected(self.author, self.other))
+        )
+        self.assertEqual(find_feed_drift(), [])
+        self.subscribe(self.other, 'delete')
+        self.assertEqual(self.get_inbox(), set())
+        self.assertEqual(find_feed_drift(), [])
+        self.assertEqual(self.read_feed(), self.get_expected(self.author))
+
+    @override_settings(FEED_INBOX_MIN_FOLLOWS=1)
+    def test_follow_and_unfollow(self):
+        rebuild_inboxes()
+        self.subscribe(self.other)
+        self.assertEqual(
+            self.get_inbox(), set(self.get_expected(self.author, self.other))
+        )
+        self.subscribe(self.author, 'delete')
+        self.assertEqual(self.get_inbox(), set(self.get_expected(self.other)))
+        self.assertEqual(find_feed_drift(), [])
+
+    @override_settings(FEED_INBOX_MIN_FOLLOWS=1)
+    def test_fan_out_on_create(self):
+        rebuild_inboxes()
+        client = APIClient()
+        client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(
+                '/api/recipes/',
+                {
+                    'ingredients': [
+                        {'id': self.ingredients[0].pk, 'amount': 1}
+                    ],
+                    'tags': [self.breakfast.pk],
+                    'image': encode_image(),
+                    'name': 'Новый рецепт',
+                    'text': 'Описание',
+                    'cooking_time': 5,
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertIn(response.json()['id'], self.get_inbox())
+        self.assertEqual(self.read_feed()[0], response.json()['id'])
+        self.assertEqual(find_feed_drift(), [])
+
+    @override_settings(FEED_INBOX_MIN_FOLLOWS=1)
+    def test_find_feed_drift(self):
+        self.assertEqual(find_feed_drift(), [self.user.pk])
+        call_command('rebuild_feeds', stdout=io.StringIO())
+        self.assertEqual(find_feed_drift(), [])
+        FeedItem.objects.filter(user=self.user).first().delete()
+        FeedItem.objects.create(
+            user=self.other,
+            recipe=self.recipes[0],
+            pub_date=self.recipes[0].pub_date,
+        )
+        self.assertEqual(find_feed_drift(), [self.user.pk, self.other.pk])
+        call_command('rebuild_feeds', stdout=io.StringIO())
+        self.assertEqual(find_feed_drift(), [])
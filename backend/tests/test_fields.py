@@ -0,0 +1,75 @@
+import base64
+import io
+import struct
+import zlib
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.fields import Base64ImageField
+from recipes.images import MAX_PIXELS
+
+from .base import encode_image
+
+
+def encode(content, mime='image/png'):
+    return f'data:{mime};base64,' + base64.b64encode(content).decode()
+
+
+def chunk(name, content):
+    return (
+        struct.pack('>I', len(content))
+        + name
+        + content
+        + struct.pack('>I', zlib.crc32(name + content))
+    )
+
+
+def png_header(width, height):
+    """Заголовок PNG с заданными размерами и пустыми данными."""
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(
+            b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+        )
+        + chunk(b'IDAT', b'')
+    )
+
+
+class Base64ImageFieldTest(SimpleTestCase):
+    """Ошибки Base64ImageField определяются до полного декодирования."""
+
+    def assert_error(self, data, code):
+        with self.assertRaises(ValidationError) as context:
+            Base64ImageField().run_validation(data)
+        self.assertEqual(context.exception.detail[0].code, code)
+
+    def test_valid(self):
+        file = Base64ImageField().run_validation(encode_image())
+        self.assertTrue(file.name.endswith('.png'))
+        self.assertEqual(Image.open(file).size, (20, 20))
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=50)
+    def test_too_large(self):
+        self.assert_error(encode_image(), 'too_large')
+
+    def test_too_many_pixels(self):
+        for size in (5000, 20000):
+            with self.subTest(size=size):
+                self.assertGreater(size * size, MAX_PIXELS)
+                self.assert_error(
+                    encode(png_header(size, size)), 'too_many_pixels'
+                )
+
+    def test_invalid_base64(self):
+        self.assert_error('data:image/png;base64,@@@@', 'invalid')
+        self.assert_error('data:image/png;base64,abc', 'invalid')
+
+    def test_unsupported_format(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (20, 20)).save(buffer, 'BMP')
+        self.assert_error(
+            encode(buffer.getvalue(), 'image/bmp'), 'invalid_image'
+        )
+        self.assert_error(encode(b'not an image'), 'invalid_image')
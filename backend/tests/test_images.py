@@ -0,0 +1,121 @@
+import io
+
+from django.core.files.base import ContentFile
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.images import (get_rendition_widths, get_renditions, open_image,
+                            rendition_name)
+from recipes.models import Recipe
+
+from .base import RecipesTestCase, encode_image
+
+
+class ImageRenditionsTest(RecipesTestCase):
+    """Копии не шире оригинала и создаются после фиксации транзакции."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.recipes[1]
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+
+    def patch_image(self, width, execute=True):
+        with self.captureOnCommitCallbacks(execute=execute) as callbacks:
+            response = self.author_client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {'image': encode_image(width, 50)},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        return Recipe.objects.get(pk=self.recipe.pk), callbacks
+
+    def get_files(self, recipe):
+        storage = recipe.image.storage
+        return [
+            name
+            for _, _, name in get_renditions(
+                recipe.image.name, recipe.image_width
+            )
+            if storage.exists(name)
+        ]
+
+    def test_widths(self):
+        self.assertEqual(get_rendition_widths(None), [])
+        self.assertEqual(get_rendition_widths(200), [200])
+        self.assertEqual(get_rendition_widths(500), [320, 500])
+        self.assertEqual(get_rendition_widths(1280), [320, 640, 1280])
+        self.assertEqual(get_rendition_widths(3000), [320, 640, 1280])
+
+    def test_small_image(self):
+        recipe, _ = self.patch_image(500)
+        self.assertEqual(recipe.image_width, 500)
+        renditions = self.user_client.get(
+            f'/api/recipes/{recipe.pk}/'
+        ).json()['image_renditions']
+        self.assertEqual(
+            [(item['width'], item['format']) for item in renditions],
+            [(320, 'webp'), (500, 'webp'), (320, 'jpeg'), (500, 'jpeg')],
+        )
+        storage = recipe.image.storage
+        for item in renditions:
+            name = item['url'].split(storage.base_url, 1)[1]
+            with storage.open(name) as file:
+                self.assertEqual(Image.open(file).width, item['width'])
+
+    def test_created_after_commit(self):
+        recipe, callbacks = self.patch_image(700, execute=False)
+        self.assertTrue(callbacks)
+        self.assertIsNone(recipe.image_width)
+        self.assertEqual(
+            self.user_client.get(
+                f'/api/recipes/{recipe.pk}/'
+            ).json()['image_renditions'],
+            [],
+        )
+
+    def test_rotated_width(self):
+        image = Image.new('RGB', (400, 200))
+        exif = image.getexif()
+        exif[0x0112] = 6
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', exif=exif)
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.image.save('rotated.jpg', ContentFile(buffer.getvalue()))
+        image, width = open_image(recipe.image)
+        self.assertEqual((width, image.width), (200, 200))
+
+    def test_names_keep_extension(self):
+        self.assertNotEqual(
+            rendition_name('recipes/pie.jpg', 320, 'webp'),
+            rendition_name('recipes/pie.png', 320, 'webp'),
+        )
+
+    def test_replaced_image(self):
+        old, _ = self.patch_image(500)
+        old_files = self.get_files(old)
+        self.assertEqual(len(old_files), 4)
+        new, _ = self.patch_image(700)
+        storage = new.image.storage
+        self.assertEqual(len(self.get_files(new)), 6)
+        self.assertFalse(any(storage.exists(name) for name in old_files))
+
+    def test_regenerated_on_change(self):
+        recipe, _ = self.patch_image(500)
+        storage = recipe.image.storage
+        name = self.get_files(recipe)[0]
+        storage.delete(name)
+        storage.save(name, ContentFile(b'stale'))
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save(update_fields=['image'])
+        with storage.open(name) as file:
+            self.assertEqual(Image.open(file).width, 320)
+
+    def test_deleted_image(self):
+        recipe, _ = self.patch_image(500)
+        files = self.get_files(recipe)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.author_client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        storage = recipe.image.storage
+        self.assertFalse(any(storage.exists(name) for name in files))
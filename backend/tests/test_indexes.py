@@ -0,0 +1,20 @@
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase
+
+from recipes import signals
+
+
+class ExtraIndexesTest(TestCase):
+    """Ошибка создания дополнительного индекса прерывает миграцию."""
+
+    def test_error_raised(self):
+        with mock.patch.object(
+            signals, 'DDL', ('CREATE INDEX broken ON missing_table (id)',)
+        ):
+            with self.assertRaises(DatabaseError):
+                signals.create_extra_indexes('default')
+
+    def test_created(self):
+        signals.create_extra_indexes('default')
@@ -0,0 +1,55 @@
+from django.test import override_settings
+
+from recipes.ingredient_index import IngredientIndex
+from recipes.models import Ingredient
+
+from .base import RecipesTestCase
+
+
+class IngredientIndexTest(RecipesTestCase):
+    """Совпадения по префиксу идут раньше совпадений по подстроке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name in ('кокосовое молоко', 'Молочный шоколад', 'ёжевика'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def get_names(self, items):
+        return [item['name'] for item in items]
+
+    def test_prefix_before_substring(self):
+        index = IngredientIndex()
+        self.assertEqual(
+            self.get_names(index.search('мол')),
+            ['молоко', 'Молочный шоколад', 'кокосовое молоко'],
+        )
+        self.assertEqual(self.get_names(index.search('Еж')), ['ёжевика'])
+        self.assertEqual(self.get_names(index.search('нет')), [])
+
+    @override_settings(INGREDIENT_SEARCH_INDEX=True)
+    def test_api_order(self):
+        response = self.anonymous_client.get(
+            '/api/ingredients/', {'name': 'молок'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.get_names(response.json()), ['молоко', 'кокосовое молоко']
+        )
+
+    def test_rebuild_on_version_change(self):
+        index = IngredientIndex()
+        self.assertEqual(index.search('хрен', version=1), [])
+        Ingredient.objects.create(name='хрен', measurement_unit='г')
+        with self.assertNumQueries(0):
+            self.assertEqual(index.search('хрен', version=1), [])
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.get_names(index.search('хрен', version=2)), ['хрен']
+            )
+
+    def test_rebuild_after_ttl(self):
+        index = IngredientIndex(ttl=-1)
+        index.search('хрен')
+        Ingredient.objects.create(name='хрен', measurement_unit='г')
+        self.assertEqual(self.get_names(index.search('хрен')), ['хрен'])
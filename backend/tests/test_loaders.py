@@ -0,0 +1,106 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.loaders import BulkLoader
+from recipes.models import Ingredient, Tag
+
+TAGS = [
+    {'name': 'Завтрак', 'color': '#E26C2D', 'slug': 'zavtrak'},
+    {'name': 'Обед', 'color': '#49B64E', 'slug': 'obed'},
+]
+
+
+class BulkLoaderTest(TestCase):
+    """Повторная загрузка ничего не добавляет, изменения обновляются."""
+
+    def setUp(self):
+        self.loader = BulkLoader(
+            Tag, key_fields=('slug',), update_fields=('name', 'color')
+        )
+
+    def test_idempotent(self):
+        self.assertEqual(
+            self.loader.load(TAGS),
+            {'inserted': 2, 'updated': 0, 'skipped': 0},
+        )
+        with CaptureQueriesContext(connection) as context:
+            stats = self.loader.load(TAGS)
+        self.assertEqual(stats, {'inserted': 0, 'updated': 0, 'skipped': 2})
+        self.assertFalse(
+            [
+                query['sql']
+                for query in context.captured_queries
+                if query['sql'].startswith(('INSERT', 'UPDATE'))
+            ]
+        )
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_update(self):
+        self.loader.load(TAGS)
+        rows = [dict(TAGS[0], color='#000000'), TAGS[1], TAGS[1]]
+        self.assertEqual(
+            self.loader.load(rows),
+            {'inserted': 0, 'updated': 1, 'skipped': 2},
+        )
+        self.assertEqual(Tag.objects.get(slug='zavtrak').color, '#000000')
+
+    def test_update_uses_bulk_update(self):
+        self.loader.load(TAGS)
+        rows = [dict(row, name=row['name'] + '!') for row in TAGS]
+        with CaptureQueriesContext(connection) as context:
+            self.loader.load(rows)
+        updates = [
+            query['sql']
+            for query in context.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 1)
+
+    def test_batches(self):
+        loader = BulkLoader(Ingredient, ('name', 'measurement_unit'), (), 2)
+        rows = [
+            {'name': f'ингредиент {number}', 'measurement_unit': 'г'}
+            for number in range(5)
+        ]
+        self.assertEqual(loader.load(rows)['inserted'], 5)
+        self.assertEqual(loader.load(rows)['skipped'], 5)
+        self.assertEqual(Ingredient.objects.count(), 5)
+
+
+class LoadIngredientsTest(TestCase):
+    """Команда читает CSV и JSON и не создаёт дубликатов."""
+
+    def write(self, extension, content):
+        file, path = tempfile.mkstemp(suffix=extension)
+        with os.fdopen(file, 'w', encoding='utf-8') as output:
+            output.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def load(self, path):
+        output = io.StringIO()
+        call_command('load_ingredients', path=path, stdout=output)
+        return output.getvalue()
+
+    def test_csv_and_json(self):
+        csv_path = self.write('.csv', 'соль,г\nсахар,г\nсоль,г\n')
+        self.assertIn('Добавлено: 2', self.load(csv_path))
+        json_path = self.write(
+            '.json',
+            json.dumps(
+                [
+                    {'name': 'соль', 'measurement_unit': 'г'},
+                    {'name': 'мука', 'measurement_unit': 'кг'},
+                ]
+            ),
+        )
+        self.assertIn('Добавлено: 1', self.load(json_path))
+        self.assertIn('Добавлено: 0', self.load(csv_path))
+        self.assertEqual(Ingredient.objects.count(), 3)
@@ -0,0 +1,50 @@
+import io
+from unittest import mock
+
+from django.core.management import call_command
+
+from recipes import matching
+from recipes.models import IngredientPosting
+
+from .base import RecipesTestCase
+
+
+class RecipeMatcherTest(RecipesTestCase):
+    """Списки по блокам id рецептов и дочитывание изменённых блоков."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(matching, 'BLOCK_SIZE', 4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        matching.rebuild_postings()
+        self.matcher = matching.RecipeMatcher(refresh_interval=0)
+        self.ingredient = self.ingredients[3].pk
+
+    def get_recipes(self):
+        return sorted(self.matcher.contains_all([self.ingredient]).tolist())
+
+    def test_blocks(self):
+        blocks = IngredientPosting.objects.filter(ingredient=self.ingredient)
+        self.assertGreater(blocks.count(), 1)
+        for posting in blocks:
+            for pk in matching.load_posting(posting.recipes):
+                self.assertEqual(pk // matching.BLOCK_SIZE, posting.block)
+        call_command(
+            'rebuild_ingredient_postings', check=True, stdout=io.StringIO()
+        )
+
+    def test_refresh_without_version(self):
+        recipes = self.get_recipes()
+        added, removed = self.recipes[0].pk, recipes[0]
+        matching.update_postings(added, added=[self.ingredient])
+        matching.update_postings(removed, removed=[self.ingredient])
+        with self.assertNumQueries(1):
+            result = self.get_recipes()
+        self.assertEqual(
+            result, sorted(set(recipes) - {removed} | {added})
+        )
+        self.assertEqual(
+            self.matcher._sizes.tolist(),
+            matching.RecipeMatcher()._get(None)[1].tolist(),
+        )
@@ -0,0 +1,96 @@
+import math
+from datetime import timedelta
+
+from django.test import SimpleTestCase
+
+from recipes import ranking
+from recipes.models import Recipe, RecipeActivity
+
+from .base import RecipesTestCase
+
+
+class AddTermTest(SimpleTestCase):
+    """Оценка в логарифмах совпадает с прямой суммой затухающих весов."""
+
+    half_life = timedelta(days=1)
+
+    def get_time(self, hours):
+        return ranking.EPOCH + timedelta(hours=hours)
+
+    def direct(self, events):
+        return math.log2(
+            sum(
+                weight * 2 ** ((created - ranking.EPOCH) / self.half_life)
+                for weight, created in events
+            )
+        )
+
+    def add(self, score, weight, created):
+        return ranking.add_term(score, weight, created, self.half_life)
+
+    def test_add(self):
+        events = [(1.0, self.get_time(5)), (2.0, self.get_time(30))]
+        score = 0.0
+        for weight, created in events:
+            score = self.add(score, weight, created)
+        self.assertAlmostEqual(score, self.direct(events))
+
+    def test_remove(self):
+        first, second = self.get_time(5), self.get_time(30)
+        score = self.add(self.add(0.0, 1.0, first), 2.0, second)
+        self.assertAlmostEqual(
+            self.add(score, -2.0, second), self.direct([(1.0, first)])
+        )
+        self.assertAlmostEqual(
+            self.add(score, -1.0, first), self.direct([(2.0, second)])
+        )
+        only = self.add(0.0, 1.0, first)
+        self.assertEqual(self.add(only, -1.0, first), 0.0)
+        self.assertEqual(self.add(0.0, -1.0, first), 0.0)
+
+    def test_no_overflow(self):
+        created = ranking.EPOCH + timedelta(days=3650)
+        score = self.add(self.add(0.0, 1.0, created), 1.0, created)
+        self.assertAlmostEqual(score, self.add(0.0, 2.0, created))
+
+
+class ApplyActivityTest(RecipesTestCase):
+    """Очередь действий применяется пачками и очищается."""
+
+    def setUp(self):
+        super().setUp()
+        ranking.rebuild_scores()
+        self.recipe = self.recipes[0]
+
+    def get_scores(self):
+        return list(
+            Recipe.objects.filter(pk=self.recipe.pk).values_list(
+                *ranking.get_score_fields()
+            )[0]
+        )
+
+    def test_queue_drained(self):
+        for action in ('favorite', 'shopping_cart'):
+            response = self.user_client.post(
+                f'/api/recipes/{self.recipe.pk}/{action}/'
+            )
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(RecipeActivity.objects.count(), 2)
+        self.assertEqual(ranking.apply_activity(batch_size=1), 1)
+        self.assertEqual(RecipeActivity.objects.count(), 1)
+        self.assertEqual(ranking.apply_activity(batch_size=1), 1)
+        self.assertEqual(ranking.apply_activity(batch_size=1), 0)
+        self.assertFalse(RecipeActivity.objects.exists())
+        self.assertEqual(ranking.find_score_drift(), [])
+        self.assertTrue(all(self.get_scores()))
+
+    def test_removal_cancels(self):
+        before = self.get_scores()
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        self.assertEqual(self.user_client.post(url).status_code, 201)
+        self.assertEqual(ranking.update_scores(), 1)
+        self.assertNotEqual(self.get_scores(), before)
+        self.assertEqual(self.user_client.delete(url).status_code, 204)
+        self.assertEqual(ranking.update_scores(), 1)
+        self.assertEqual(self.get_scores(), before)
+        self.assertEqual(ranking.find_score_drift(), [])
@@ -0,0 +1,101 @@
+from django.db import connection
+
+from recipes.models import Recipe
+
+from .base import RecipesTestCase
+
+# Количество, страница рецептов, теги и ингредиенты страницы.
+LIST_QUERIES = 4
+
+
+def unfiltered_list_queries():
+    """Без фильтров на PostgreSQL сначала читается оценка из pg_class."""
+    return LIST_QUERIES + (connection.vendor == 'postgresql')
+
+
+class RecipeFilterTest(RecipesTestCase):
+    def expected_ids(self, recipes):
+        return sorted((recipe.id for recipe in recipes), reverse=True)
+
+    def test_is_favorited(self):
+        with self.assertNumQueries(LIST_QUERIES):
+            response = self.user_client.get(
+                '/api/recipes/?is_favorited=1&limit=20'
+            )
+        self.assertEqual(
+            self.get_ids(response), self.expected_ids(self.favorited)
+        )
+        self.assertEqual(response.json()['count'], len(self.favorited))
+
+    def test_is_in_shopping_cart(self):
+        with self.assertNumQueries(LIST_QUERIES):
+            response = self.user_client.get(
+                '/api/recipes/?is_in_shopping_cart=1&limit=20'
+            )
+        self.assertEqual(
+            self.get_ids(response), self.expected_ids(self.in_cart)
+        )
+
+    def test_user_filter_count_not_cached(self):
+        url = '/api/recipes/?is_favorited=1&limit=2'
+        self.assertEqual(
+            self.user_client.get(url).json()['count'], len(self.favorited)
+        )
+        response = self.user_client.post(
+            f'/api/recipes/{self.recipes[0].id}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.user_client.get(url).json()['count'],
+            len(self.favorited) + 1,
+        )
+
+    def test_user_filters_ignored_for_anonymous(self):
+        response = self.anonymous_client.get(
+            '/api/recipes/?is_favorited=1&is_in_shopping_cart=1&limit=20'
+        )
+        self.assertEqual(
+            self.get_ids(response), self.expected_ids(self.recipes)
+        )
+
+    def test_tags_without_duplicates(self):
+        with self.assertNumQueries(LIST_QUERIES):
+            response = self.user_client.get(
+                '/api/recipes/?tags=breakfast&tags=lunch&limit=20'
+            )
+        ids = self.get_ids(response)
+        self.assertEqual(ids, self.expected_ids(self.recipes))
+        self.assertEqual(response.json()['count'], len(self.recipes))
+
+    def test_single_tag(self):
+        response = self.anonymous_client.get(
+            '/api/recipes/?tags=breakfast&limit=20'
+        )
+        expected = Recipe.objects.filter(tags=self.breakfast)
+        self.assertEqual(self.get_ids(response), self.expected_ids(expected))
+
+    def test_author(self):
+        response = self.anonymous_client.get(
+            f'/api/recipes/?author={self.author.id}&limit=20'
+        )
+        expected = Recipe.objects.filter(author=self.author)
+        self.assertEqual(self.get_ids(response), self.expected_ids(expected))
+
+
+class RecipeListQueriesTest(RecipesTestCase):
+    def test_query_count_does_not_depend_on_page_size(self):
+        for limit in (2, 10):
+            for name in ('user_client', 'anonymous_client'):
+                with self.subTest(limit=limit, client=name):
+                    self.setUp()
+                    client = getattr(self, name)
+                    with self.assertNumQueries(unfiltered_list_queries()):
+                        response = client.get(f'/api/recipes/?limit={limit}')
+                    self.assertEqual(len(self.get_ids(response)), limit)
+
+    def test_detail_query_count(self):
+        with self.assertNumQueries(3):
+            response = self.user_client.get(
+                f'/api/recipes/{self.recipes[0].id}/'
+            )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,65 @@
+import re
+import time
+from unittest import mock
+
+from django.test import override_settings
+
+from api.representations import recipe_representation
+
+from .base import RecipesTestCase
+
+
+class RecipeRepresentationTest(RecipesTestCase):
+    """Быстрое представление совпадает с RecipesListSerializer байт в байт."""
+
+    def get_content(self, client, url, fast):
+        with override_settings(RECIPES_FAST_REPRESENTATION=fast):
+            self.setUp()
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.content
+
+    def assert_same_content(self, url):
+        for name in ('anonymous_client', 'user_client'):
+            with self.subTest(url=url, client=name):
+                client = getattr(self, name)
+                self.assertEqual(
+                    self.get_content(client, url, fast=True),
+                    self.get_content(client, url, fast=False),
+                )
+
+    def test_list(self):
+        self.assert_same_content('/api/recipes/?limit=20')
+        self.assert_same_content('/api/recipes/?page=2&limit=5')
+
+    def test_filtered_list(self):
+        self.assert_same_content('/api/recipes/?is_favorited=1')
+        self.assert_same_content('/api/recipes/?tags=breakfast')
+
+    def test_detail(self):
+        for recipe in self.recipes[:4]:
+            self.assert_same_content(f'/api/recipes/{recipe.id}/')
+
+    @override_settings(RECIPES_FAST_REPRESENTATION=True)
+    def test_serialization_time(self):
+        render = recipe_representation.render
+
+        def slow_render(*args):
+            time.sleep(0.02)
+            return render(*args)
+
+        with mock.patch.object(
+            recipe_representation, 'render', side_effect=slow_render
+        ):
+            for url in (
+                '/api/recipes/',
+                f'/api/recipes/{self.recipes[0].id}/',
+                f'/api/recipes/{self.recipes[0].id}/similar/',
+            ):
+                with self.subTest(url=url):
+                    response = self.user_client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    duration = re.search(
+                        r'ser;dur=([0-9.]+)', response['Server-Timing']
+                    )
+                    self.assertGreaterEqual(float(duration[1]), 20)
@@ -0,0 +1,204 @@
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api import serializers
+from recipes.models import Recipe, RecipeIngredient
+
+from .base import RecipesTestCase, encode_image
+
+
+class RecipeUpdateTest(RecipesTestCase):
+    """Правка рецепта не затирает счётчики и оценки, изменённые параллельно."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.recipes[1]
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+
+    def bump(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            favorites_count=F('favorites_count') + 1,
+            carts_count=F('carts_count') + 1,
+            popularity=F('popularity') + 1,
+            trending=F('trending') + 1,
+        )
+
+    def get_counters(self):
+        return Recipe.objects.values_list(
+            'favorites_count', 'carts_count', 'popularity', 'trending'
+        ).get(pk=self.recipe.pk)
+
+    def test_patch_keeps_counters(self):
+        expected = tuple(value + 1 for value in self.get_counters())
+
+        def update_postings(*args, **kwargs):
+            self.bump()
+            return original(*args, **kwargs)
+
+        original = serializers.update_postings
+        with mock.patch.object(
+            serializers, 'update_postings', side_effect=update_postings
+        ):
+            response = self.author_client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {
+                    'name': 'Новое название',
+                    'ingredients': [
+                        {'id': self.ingredients[0].pk, 'amount': 7}
+                    ],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_counters(), expected)
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).name, 'Новое название'
+        )
+
+    def test_admin_keeps_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        expected = tuple(value + 1 for value in self.get_counters())
+        self.bump()
+        recipe.name = 'Из админки'
+        form = mock.Mock(changed_data=['name', 'tags'])
+        site._registry[Recipe].save_model(None, recipe, form, change=True)
+        self.assertEqual(self.get_counters(), expected)
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).name, 'Из админки'
+        )
+
+
+class RecipeWriteTest(RecipesTestCase):
+    """Создание и правка рецепта: проверка данных, запросы, откат."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.recipes[3]
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def get_body(self, **fields):
+        body = {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': encode_image(),
+            'tags': [self.breakfast.pk],
+            'ingredients': [{'id': self.ingredients[0].pk, 'amount': 1}],
+        }
+        body.update(fields)
+        return body
+
+    def get_state(self):
+        return (
+            sorted(
+                RecipeIngredient.objects.filter(
+                    recipe=self.recipe
+                ).values_list('ingredient_id', 'amount')
+            ),
+            sorted(self.recipe.tags.values_list('id', flat=True)),
+        )
+
+    def test_invalid_body(self):
+        count = Recipe.objects.count()
+        unknown = max(tag.pk for tag in (self.breakfast, self.lunch)) + 100
+        for fields in (
+            {'tags': []},
+            {'tags': [unknown]},
+            {
+                'ingredients': [
+                    {'id': self.ingredients[0].pk, 'amount': 1},
+                    {'id': self.ingredients[0].pk, 'amount': 2},
+                ]
+            },
+            {'ingredients': [{'id': unknown, 'amount': 1}]},
+        ):
+            with self.subTest(fields=fields):
+                response = self.author_client.post(
+                    '/api/recipes/', self.get_body(**fields), format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(fields)), response.json())
+        self.assertEqual(Recipe.objects.count(), count)
+
+    def test_amount_change_keeps_rows(self):
+        rows = dict(
+            RecipeIngredient.objects.filter(recipe=self.recipe).values_list(
+                'ingredient_id', 'id'
+            )
+        )
+        response = self.author_client.patch(
+            self.url,
+            {
+                'ingredients': [
+                    {'id': pk, 'amount': 50} for pk in sorted(rows)
+                ]
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            dict(
+                RecipeIngredient.objects.filter(
+                    recipe=self.recipe
+                ).values_list('ingredient_id', 'id')
+            ),
+            rows,
+        )
+        self.assertEqual(
+            set(
+                RecipeIngredient.objects.filter(
+                    recipe=self.recipe
+                ).values_list('amount', flat=True)
+            ),
+            {50},
+        )
+
+    def test_one_query_per_relation(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.author_client.patch(
+                self.url,
+                {
+                    'tags': [self.breakfast.pk, self.lunch.pk],
+                    'ingredients': [
+                        {'id': ingredient.pk, 'amount': 3}
+                        for ingredient in self.ingredients
+                    ],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        sql = [query['sql'] for query in context.captured_queries]
+        for table in ('recipes_tag', 'recipes_ingredient'):
+            with self.subTest(table=table):
+                self.assertEqual(
+                    sum(f'"{table}"."id" IN' in query for query in sql), 1
+                )
+
+    def test_rollback(self):
+        state = self.get_state()
+        with mock.patch.object(
+            serializers, 'update_search_vectors', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.author_client.patch(
+                    self.url,
+                    self.get_body(
+                        tags=[self.lunch.pk],
+                        ingredients=[
+                            {'id': self.ingredients[2].pk, 'amount': 9}
+                        ],
+                    ),
+                    format='json',
+                )
+        self.assertEqual(self.get_state(), state)
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).name, self.recipe.name
+        )
@@ -0,0 +1,36 @@
+from recipes.models import Recipe
+from recipes.search import update_search_vectors
+
+from .base import RecipesTestCase, make_image
+
+
+class RecipeSearchTest(RecipesTestCase):
+    """Поиск рецептов не зависит от регистра, в том числе кириллицы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.soups = [
+            Recipe.objects.create(
+                author=cls.author,
+                name=name,
+                text='Описание',
+                cooking_time=30,
+                image=make_image(),
+            )
+            for name in ('Суп гороховый', 'Грибной суп')
+        ]
+        update_search_vectors()
+
+    def search(self, query):
+        response = self.anonymous_client.get(
+            '/api/recipes/search/', {'q': query, 'limit': 20}
+        )
+        self.assertEqual(response.status_code, 200)
+        return sorted(self.get_ids(response))
+
+    def test_cyrillic_case(self):
+        expected = sorted(recipe.id for recipe in self.soups)
+        for query in ('суп', 'Суп', 'СУП'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), expected)
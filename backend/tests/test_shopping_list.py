@@ -0,0 +1,95 @@
+import io
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.core.management import CommandError, call_command
+
+from recipes.admin import RecipeAdmin
+from recipes.models import (Recipe, RecipeIngredient, ShoppingCart,
+                            ShoppingListItem)
+from recipes.shopping_list import (find_drift, rebuild_totals, refresh_cart,
+                                   refresh_recipe)
+
+from .base import RecipesTestCase
+
+
+class ShoppingListTotalsTest(RecipesTestCase):
+    """Итоги списка покупок совпадают с пересчётом по корзинам."""
+
+    def setUp(self):
+        super().setUp()
+        rebuild_totals()
+        self.recipe = self.in_cart[0]
+
+    def get_amount(self, ingredient):
+        return ShoppingListItem.objects.get(
+            user=self.user, ingredient=ingredient
+        ).amount
+
+    def test_refresh_cart(self):
+        recipe = self.recipes[3]
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        self.assertNotEqual(find_drift(), [])
+        refresh_cart(self.user, recipe)
+        self.assertEqual(find_drift(), [])
+        ShoppingCart.objects.filter(user=self.user, recipe=recipe).delete()
+        refresh_cart(self.user, recipe)
+        self.assertEqual(find_drift(), [])
+
+    def test_refresh_recipe(self):
+        ingredient = self.ingredients[0]
+        amount = self.get_amount(ingredient)
+        row = RecipeIngredient.objects.get(
+            recipe=self.recipe, ingredient=ingredient
+        )
+        RecipeIngredient.objects.filter(pk=row.pk).update(amount=100)
+        refresh_recipe(self.recipe, [ingredient.pk])
+        self.assertEqual(find_drift(), [])
+        self.assertEqual(
+            self.get_amount(ingredient), amount - row.amount + 100
+        )
+
+    def test_find_drift(self):
+        ingredient = self.ingredients[0]
+        ShoppingListItem.objects.filter(
+            user=self.user, ingredient=ingredient
+        ).update(amount=1)
+        ShoppingListItem.objects.filter(
+            user=self.user, ingredient=self.ingredients[1]
+        ).delete()
+        self.assertEqual(
+            find_drift(),
+            sorted(
+                [
+                    (self.user.pk, ingredient.pk),
+                    (self.user.pk, self.ingredients[1].pk),
+                ]
+            ),
+        )
+
+    def test_rebuild_command(self):
+        ShoppingListItem.objects.filter(user=self.user).delete()
+        with self.assertRaises(CommandError):
+            call_command(
+                'rebuild_shopping_lists', check=True, stdout=io.StringIO()
+            )
+        call_command('rebuild_shopping_lists', stdout=io.StringIO())
+        self.assertEqual(find_drift(), [])
+        call_command(
+            'rebuild_shopping_lists', check=True, stdout=io.StringIO()
+        )
+
+    def test_admin_save_related(self):
+        removed, added = self.ingredients[0], self.ingredients[3]
+
+        def save_m2m():
+            RecipeIngredient.objects.filter(
+                recipe=self.recipe, ingredient=removed
+            ).delete()
+            RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=added, amount=7
+            )
+
+        form = mock.Mock(instance=self.recipe, save_m2m=save_m2m)
+        RecipeAdmin(Recipe, site).save_related(None, form, [], True)
+        self.assertEqual(find_drift(), [])
@@ -0,0 +1,40 @@
+from unittest import mock
+
+from recipes import similarity
+from recipes.models import RecipeIngredient, SimilarityUpdate
+
+from .base import RecipesTestCase
+
+
+class UpdateSimilarTest(RecipesTestCase):
+    """Пересчёт похожих по очереди совпадает с полным пересчётом."""
+
+    def setUp(self):
+        super().setUp()
+        similarity.rebuild_similar()
+        recipe = self.recipes[3]
+        RecipeIngredient.objects.filter(recipe=recipe).delete()
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=self.ingredients[3], amount=1
+        )
+        recipe.tags.set([self.breakfast])
+        similarity.mark_stale([recipe.pk])
+
+    def test_update(self):
+        self.assertNotEqual(similarity.find_similar_drift(), [])
+        stale, saved = similarity.update_similar()
+        self.assertEqual(stale, 1)
+        self.assertGreater(saved, 0)
+        self.assertEqual(similarity.find_similar_drift(), [])
+        self.assertFalse(SimilarityUpdate.objects.exists())
+
+    def test_failure_requeues(self):
+        with mock.patch.object(
+            similarity, 'refresh_similar', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                similarity.update_similar()
+        self.assertEqual(
+            list(SimilarityUpdate.objects.values_list('recipe_id', flat=True)),
+            [self.recipes[3].pk],
+        )
@@ -0,0 +1,54 @@
+from recipes.models import Follow, Recipe
+from users.models import User
+
+from .base import RecipesTestCase
+
+SUBSCRIPTIONS_QUERIES = 3
+
+
+class SubscriptionsTest(RecipesTestCase):
+    """Число запросов подписок не зависит от числа авторов и рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for author in (cls.author, cls.other):
+            User.objects.filter(pk=author.pk).update(
+                recipes_count=author.recipes.count()
+            )
+
+    def get_subscriptions(self, recipes_limit):
+        with self.assertNumQueries(SUBSCRIPTIONS_QUERIES):
+            response = self.user_client.get(
+                '/api/users/subscriptions/',
+                {'recipes_limit': recipes_limit, 'limit': 10},
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['results']
+
+    def assert_authors(self, authors, recipes_limit):
+        results = self.get_subscriptions(recipes_limit)
+        self.assertEqual(
+            [author['id'] for author in results],
+            [author.pk for author in authors],
+        )
+        for author, data in zip(authors, results):
+            recipes = Recipe.objects.filter(author=author)
+            self.assertEqual(data['recipes_count'], recipes.count())
+            self.assertEqual(
+                [recipe['id'] for recipe in data['recipes']],
+                list(
+                    recipes.order_by('-pub_date').values_list(
+                        'id', flat=True
+                    )[:recipes_limit]
+                ),
+            )
+
+    def test_query_count(self):
+        for recipes_limit in (1, 5):
+            with self.subTest(authors=1, recipes_limit=recipes_limit):
+                self.assert_authors([self.author], recipes_limit)
+        Follow.objects.create(user=self.user, author=self.other)
+        for recipes_limit in (1, 5):
+            with self.subTest(authors=2, recipes_limit=recipes_limit):
+                self.assert_authors([self.author, self.other], recipes_limit)
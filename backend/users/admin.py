@@ -13,6 +13,7 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'date_joined',
+        'recipes_count',
     )
     search_fields = ('email', 'username', 'first_name', 'last_name')
     list_filter = ('email', 'username',)
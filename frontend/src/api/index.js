@@ -2,6 +2,7 @@ class Api {
   constructor (url, headers) {
     this._url = url
     this._headers = headers
+    this._recipesPage = null
   }
 
   checkResponse (res) {
@@ -114,8 +115,9 @@ class Api {
       const token = localStorage.getItem('token')
       const authorization = token ? { 'authorization': `Token ${token}` } : {}
       const tagsString = tags ? tags.filter(tag => tag.value).map(tag => `&tags=${tag.slug}`).join('') : ''
+      const query = `limit=${limit}${author ? `&author=${author}` : ''}${is_favorited ? `&is_favorited=${is_favorited}` : ''}${is_in_shopping_cart ? `&is_in_shopping_cart=${is_in_shopping_cart}` : ''}${tagsString}`
       return fetch(
-        `/api/recipes/?page=${page}&limit=${limit}${author ? `&author=${author}` : ''}${is_favorited ? `&is_favorited=${is_favorited}` : ''}${is_in_shopping_cart ? `&is_in_shopping_cart=${is_in_shopping_cart}` : ''}${tagsString}`,
+        this.getRecipesPageUrl(query, page),
         {
           method: 'GET',
           headers: {
@@ -123,7 +125,26 @@ class Api {
             ...authorization
           }
         }
-      ).then(this.checkResponse)
+      ).then(this.checkResponse).then(res => {
+        this._recipesPage = { query, page, next: res.next, previous: res.previous }
+        return res
+      })
+  }
+
+  getRecipesPageUrl (query, page) {
+    // neighbouring pages follow the next/previous cursor links,
+    // ?page=N makes the server skip (N - 1) * limit rows
+    const last = this._recipesPage
+    let link = null
+    if (last && last.query === query) {
+      if (page === last.page + 1) link = last.next
+      if (page === last.page - 1) link = last.previous
+    }
+    if (link) {
+      const { pathname, search } = new URL(link)
+      return `${pathname}${search}`
+    }
+    return `/api/recipes/?page=${page}&${query}`
   }
 
   getRecipe ({